@@ -4,104 +4,142 @@ This script analyzes a given Spotify playlist's audio features, calculates descr
 
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# Path to the CSV file containing the playlist's audio features
-csv_playlist_data_path = "afrobeats.csv"
+from feature_store import DEFAULT_CHUNK_SIZE, FeatureStore
+from feature_stats import DEFAULT_COMPRESSION, STATISTICS, StreamingStats, describe_features
 
+# Name of the playlist in the feature store whose audio features are analyzed
+playlist_name = "afrobeats"
 
-def audio_values_range(filepath):
+
+def load_playlist_data(source):
+    """
+    Returns a playlist's data as a DataFrame.
+
+    Parameters:
+    - source: A DataFrame, which is returned as is, or the path to a CSV file
+      containing the playlist's audio features.
+    """
+    if isinstance(source, pd.DataFrame):
+        return source
+    return pd.read_csv(source)
+
+
+def audio_values_range(playlist_data, weights=None):
     """
     Calculates the descriptive statistics and interquartile range for each audio feature in a playlist.
 
+    All numeric columns are converted to one matrix and described in a single
+    vectorized pass (see `feature_stats.describe_features`).
+
     Parameters:
-    - filepath: The path to the CSV file containing the playlist's audio features.
+    - playlist_data: DataFrame of the playlist's audio features (e.g. from the feature store),
+      or the path to a CSV file containing them.
+    - weights: Optional weights per track, either a column name (e.g. "popularity")
+      or a sequence with one weight per row.
 
     Returns:
     - DataFrame containing the descriptive statistics for each audio feature.
     """
-    playlist_data = pd.read_csv(filepath)
-    audio_metrics_stats = {}
-
-    for column in playlist_data:
-        try:
-            descriptive = playlist_data[column].describe()
-            descriptive.rename(
-                index={"25%": "Q1", "50%": "Median", "75%": "Q3"}, inplace=True
-            )
-            iq_range = (
-                descriptive.loc["Q3"] - descriptive.loc["Q1"]
-            )  # Calculate the IQR
-            descriptive.loc["IQR"] = iq_range
-
-            column_stats = {
-                statistic: value for statistic, value in descriptive.items()
-            }
-            audio_metrics_stats[column] = column_stats
-
-        except Exception as e:
-            print(f"Non-numeric data skipped: {column}")
-
-    audio_metrics_df = pd.DataFrame(audio_metrics_stats)
+    playlist_data = load_playlist_data(playlist_data)
+    numeric_data = playlist_data.select_dtypes(include="number")
+    for column in playlist_data.columns.difference(numeric_data.columns):
+        print(f"Non-numeric data skipped: {column}")
+
+    if isinstance(weights, str):
+        weights = playlist_data[weights]
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)
+
+    statistics = describe_features(numeric_data.to_numpy(dtype=np.float64), weights)
+    audio_metrics_df = pd.DataFrame(
+        statistics, index=STATISTICS, columns=numeric_data.columns
+    )
     return audio_metrics_df
 
 
-audio_metrics = audio_values_range(csv_playlist_data_path)
+def streaming_values_range(chunks, weights=None, compression=DEFAULT_COMPRESSION):
+    """
+    Calculates the statistics of `audio_values_range` chunk by chunk, in bounded memory.
+
+    Count, mean, standard deviation, min and max are exact; the quartiles are
+    estimated with t-digests (see `feature_stats.StreamingStats`) and are exact
+    for up to `compression` tracks.
+
+    Parameters:
+    - chunks: Iterable of DataFrames or column dicts (e.g. `FeatureStore.iter_chunks`),
+      or the path to a CSV file, which is read in chunks.
+    - weights: Optional column name weighting every track, e.g. "popularity".
+    - compression: t-digest compression; higher is more accurate.
 
-# Importing the genre_recommendations function from the generate_recommendations script.
-# It's assumed that 'generate_recommendations.py' is correctly renamed and contains the required function.
-from generate_recommendations import genre_recommendations, choose_genre_seed
+    Returns:
+    - tuple: DataFrame containing the descriptive statistics for each audio feature,
+      and the `StreamingStats` sketch, which can be merged with others or saved.
+    """
+    if isinstance(chunks, str):
+        chunks = pd.read_csv(chunks, chunksize=DEFAULT_CHUNK_SIZE)
+
+    columns = None
+    stats = None
+    for chunk in chunks:
+        chunk = pd.DataFrame(chunk)
+        if columns is None:
+            columns = chunk.select_dtypes(include="number").columns
+            for column in chunk.columns.difference(columns):
+                print(f"Non-numeric data skipped: {column}")
+            stats = StreamingStats(len(columns), compression)
+        stats.update(
+            chunk[columns].to_numpy(dtype=np.float64),
+            None if weights is None else chunk[weights].to_numpy(dtype=np.float64),
+        )
+    if stats is None:
+        raise ValueError("No chunks to profile")
+    audio_metrics_df = pd.DataFrame(stats.describe(), index=STATISTICS, columns=columns)
+    return audio_metrics_df, stats
+
+
+def playlist_profile(name=playlist_name, store=None, weights=None):
+    """
+    Loads a playlist from the feature store and calculates its audio feature profile.
 
-# Example genre and market choice for generating recommendations
-genre_choice = "salsa"
-market_choice = "US"
+    Parameters:
+    - name: Name of the playlist in the feature store.
+    - store: The FeatureStore to read from. Defaults to the store in `STORE_PATH`.
+    - weights: Optional weights per track (see `audio_values_range`).
 
-# Generating recommendations based on the calculated audio metrics, genre, and market choice
-recommendations = genre_recommendations(genre_choice, market_choice, audio_metrics)
+    Returns:
+    - tuple: The playlist's DataFrame and its descriptive statistics.
+    """
+    store = FeatureStore() if store is None else store
+    playlist_data = store.to_dataframe(playlist=name)
+    return playlist_data, audio_values_range(playlist_data, weights)
 
 
-def plot_descriptive(descriptive_stats, filepath):
+def plot_descriptive(descriptive_stats, playlist_data, output=None, formats=("png",)):
     """
     Plots descriptive statistics for audio features in a playlist.
 
+    All features are drawn as one grid of box plots (see `charts.draw_profile`).
+
     Parameters:
-    - descriptive_stats: Descriptive statistics for the playlist's audio features.
-    - filepath: Path to the CSV file containing the playlist data.
+    - descriptive_stats: Descriptive statistics for the playlist's audio features,
+      as returned by `audio_values_range`.
+    - playlist_data: DataFrame of the playlist data, or the path to a CSV file containing it.
+    - output: Path of the chart file. When given, the chart is rendered headless
+      and written once per format instead of being shown in a window.
+    - formats: Formats of the written chart, "png" and/or "svg".
+
+    Returns:
+    - list: The paths of the written files, or None when the chart is shown.
     """
-    playlist_data = pd.read_csv(filepath)
-    for column in playlist_data:
-        if column not in ["name", "id"]:
-            plt.figure(figsize=(10, 6))
-            sns.boxplot(y=playlist_data[column], color="lightblue", width=0.3)
-            plt.scatter(
-                x=0, y=descriptive_stats["50%"], color="red", zorder=5, label="Median"
-            )
-            plt.scatter(
-                x=0, y=descriptive_stats["mean"], color="blue", zorder=5, label="Mean"
-            )
-
-            plt.text(
-                x=0.4,
-                y=descriptive_stats["25%"],
-                s=f"Q1\n{descriptive_stats['25%']:.2f}",
-                color="green",
-                verticalalignment="center",
-            )
-            plt.text(
-                x=0.4,
-                y=descriptive_stats["75%"],
-                s=f"Q3\n{descriptive_stats['75%']:.2f}",
-                color="green",
-                verticalalignment="center",
-            )
-            plt.xlim(-0.5, 1)
-            plt.title(f"Box Plot and Statistics for {column}")
-            plt.ylabel(column)
-            plt.legend()
-            plt.grid(True, which="both", linestyle="--", linewidth=0.5, axis="y")
-            plt.show()
-
-
-# Example call to plot_descriptive, assuming descriptive statistics for a specific column are provided in a dictionary format
-# plot_descriptive(descriptive_stats={'mean': value, '50%': value, '25%': value, '75%': value}, filepath=csv_playlist_data_path)
+    from charts import draw_profile, profile_figure, save_figure
+
+    playlist_data = load_playlist_data(playlist_data)
+    if output is not None:
+        return save_figure(profile_figure(playlist_data, descriptive_stats), output, formats)
+
+    import matplotlib.pyplot as plt
+
+    figure = plt.figure(figsize=(16, 8), layout="constrained")
+    draw_profile(figure, playlist_data, descriptive_stats)
+    plt.show()
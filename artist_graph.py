@@ -0,0 +1,207 @@
+"""
+Breadth-first crawler for Spotify's related-artists graph.
+
+Starting from seed artists, the related artists of every artist on the
+current level are fetched concurrently, and new artists form the next level
+up to the requested depth. Artists are identified by their Spotify ID and
+mapped to integer indices. The graph is stored as compressed sparse rows
+(CSR): an `indptr` offset array and an `indices` neighbour array. Tens of
+thousands of artists then only take a few bytes per edge, and neighbour and
+k-hop queries are array slices.
+"""
+
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from batching import DEFAULT_MAX_WORKERS
+from metrics import timed
+from response_json import RelatedArtists, decode
+from spotify_client import get
+
+
+def fetch_related_artists(artist_id):
+    """
+    Fetches the related artists of one artist.
+
+    :param artist_id: Spotify ID of the artist.
+    :return: List of (Spotify ID, name) tuples of the related artists.
+    """
+    result = get(f"/artists/{artist_id}/related-artists")
+    result.raise_for_status()
+    return [(rel.id, rel.name) for rel in decode(result, RelatedArtists).artists]
+
+
+class ArtistGraph:
+    """
+    Directed related-artists graph in CSR form.
+
+    The related artists of the artist with index `i` are
+    `indices[indptr[i]:indptr[i + 1]]`.
+
+    :param ids: Spotify artist IDs, one per node index.
+    :param names: Artist names, one per node index.
+    :param indptr: int64 array of length len(ids) + 1 with the row offsets.
+    :param indices: int32 array with the neighbour index of every edge.
+    """
+
+    def __init__(self, ids, names, indptr, indices):
+        self.ids = list(ids)
+        self.names = list(names)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.indices = np.asarray(indices, dtype=np.int32)
+        self.index = {artist_id: i for i, artist_id in enumerate(self.ids)}
+
+    @classmethod
+    def from_edges(cls, ids, names, sources, targets):
+        """
+        Builds the CSR arrays from parallel arrays of edge sources and targets.
+        """
+        sources = np.asarray(sources, dtype=np.int32)
+        targets = np.asarray(targets, dtype=np.int32)
+        order = np.argsort(sources, kind="stable")
+        counts = np.bincount(sources, minlength=len(ids))
+        indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return cls(ids, names, indptr, targets[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def edge_count(self):
+        return len(self.indices)
+
+    def neighbour_indices(self, i):
+        """
+        Returns the indices of the related artists of the node with index `i`.
+        """
+        return self.indices[self.indptr[i] : self.indptr[i + 1]]
+
+    def neighbours(self, artist_id):
+        """
+        Returns the Spotify IDs of the related artists of an artist.
+        """
+        return [self.ids[j] for j in self.neighbour_indices(self.index[artist_id])]
+
+    def k_hop(self, artist_id, k):
+        """
+        Returns the artists reachable from an artist in at most `k` hops.
+
+        :param artist_id: Spotify ID of the start artist.
+        :param k: Maximum number of hops.
+        :return: Dictionary mapping the Spotify ID of every reached artist
+                 (excluding the start artist) to its hop distance.
+        """
+        start = self.index[artist_id]
+        distance = np.full(len(self), -1, dtype=np.int32)
+        distance[start] = 0
+        frontier = np.array([start], dtype=np.int32)
+        for hop in range(1, k + 1):
+            if len(frontier) == 0:
+                break
+            reached = np.concatenate([self.neighbour_indices(i) for i in frontier])
+            frontier = np.unique(reached[distance[reached] < 0])
+            distance[frontier] = hop
+        reached = np.flatnonzero(distance > 0)
+        return {self.ids[i]: int(distance[i]) for i in reached}
+
+    def save(self, path):
+        """
+        Saves the graph to a compressed NumPy archive (.npz).
+        """
+        np.savez_compressed(
+            path,
+            ids=np.asarray(self.ids, dtype="U22"),
+            names=np.asarray(self.names, dtype=str),
+            indptr=self.indptr,
+            indices=self.indices,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a graph saved with `save`.
+        """
+        with np.load(path) as data:
+            return cls(data["ids"].tolist(), data["names"].tolist(), data["indptr"], data["indices"])
+
+
+@timed("artists.crawl")
+def crawl_related_artists(
+    seed_ids,
+    depth=2,
+    max_workers=DEFAULT_MAX_WORKERS,
+    max_nodes=None,
+    fetch=fetch_related_artists,
+    failed=None,
+):
+    """
+    Crawls the related-artists graph breadth-first from seed artists.
+
+    Each level is fetched concurrently. Every artist is fetched at most once,
+    tracked through a visited map keyed by artist ID. Artists first seen on
+    the last level are included as nodes, but their own related artists are
+    not fetched. An artist whose related artists fail to fetch (e.g. a
+    removed artist) is reported and kept without edges, and the rest of the
+    level is still expanded.
+
+    :param seed_ids: Spotify IDs of the start artists.
+    :param depth: Number of hops to expand from the seeds.
+    :param max_workers: Maximum number of requests in flight at the same time.
+    :param max_nodes: Optional limit on the number of artists in the graph.
+    :param fetch: Returns the (ID, name) list of related artists of an artist ID.
+    :param failed: Optional dict that receives the exception of every artist
+                   whose related artists could not be fetched, keyed by artist ID.
+    :return: The crawled ArtistGraph.
+    """
+    failed = {} if failed is None else failed
+    ids = []
+    names = []
+    index = {}
+    # Edge lists as compact typed arrays while the crawl is running
+    sources = array("i")
+    targets = array("i")
+
+    def add_node(artist_id, name):
+        if artist_id not in index:
+            index[artist_id] = len(ids)
+            ids.append(artist_id)
+            names.append(name)
+        return index[artist_id]
+
+    frontier = []
+    for artist_id in seed_ids:
+        if artist_id not in index:
+            add_node(artist_id, "")
+            frontier.append(artist_id)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for level in range(depth):
+            if not frontier:
+                break
+            next_frontier = []
+            futures = {artist_id: executor.submit(fetch, artist_id) for artist_id in frontier}
+            for artist_id, future in futures.items():
+                try:
+                    related = future.result()
+                except Exception as error:
+                    print(f"Failed to fetch related artists of {artist_id}: {error!r}")
+                    failed[artist_id] = error
+                    continue
+                source = index[artist_id]
+                for rel_id, rel_name in related:
+                    if rel_id not in index:
+                        if max_nodes is not None and len(ids) >= max_nodes:
+                            continue
+                        next_frontier.append(rel_id)
+                    elif not names[index[rel_id]]:
+                        # Seeds get their name once another artist links to them
+                        names[index[rel_id]] = rel_name
+                    sources.append(source)
+                    targets.append(add_node(rel_id, rel_name))
+            print(f"Level {level + 1}: {len(ids)} artists, {len(sources)} edges")
+            frontier = next_frontier
+
+    return ArtistGraph.from_edges(ids, names, sources, targets)
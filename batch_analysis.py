@@ -0,0 +1,264 @@
+"""
+Concurrent fetching and profiling of many playlists.
+
+Fetching is I/O bound, so a thread pool fetches several playlists at once
+through the shared client (which keeps applying its rate limits). Every
+fetched playlist is written to the feature store from the calling thread, and
+its feature matrix is handed to a process pool that computes the profile
+statistics, so profiling scales with the number of cores. The profiles are
+combined into one table with a row per (playlist, statistic).
+
+`profile_catalogue` profiles the whole store or the union of many playlists
+(e.g. every playlist of a genre) in bounded memory: row ranges are read in
+chunks by worker processes, each returning a `StreamingStats` sketch, and the
+sketches are merged into one profile.
+"""
+
+import math
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from feature_stats import DEFAULT_COMPRESSION, STATISTICS, StreamingStats, describe_features
+from feature_store import DEFAULT_CHUNK_SIZE, STORE_PATH, FeatureStore
+from track_records import AUDIO_FEATURES
+
+# Number of playlists fetched at the same time
+DEFAULT_FETCH_WORKERS = 4
+
+# Columns described by the profiles, as in `audio_values_range`
+PROFILE_COLUMNS = ["popularity", *AUDIO_FEATURES]
+
+
+def profile_values(columns, weights=None):
+    """
+    Extracts the matrix and weights to profile from a playlist's columns.
+
+    Args:
+        columns (dict): Column name to array, e.g. from `FeatureStore.load` or
+            `track_records.track_columns`.
+        weights (str): Optional column weighting every track, e.g. "popularity".
+
+    Returns:
+        tuple: The float64 matrix of shape (tracks, len(PROFILE_COLUMNS)) and
+        the weights array (or None).
+    """
+    values = np.column_stack(
+        [np.asarray(columns[column], dtype=np.float64) for column in PROFILE_COLUMNS]
+    )
+    if weights is None:
+        return values, None
+    return values, np.asarray(columns[weights], dtype=np.float64)
+
+
+def _describe(job):
+    """
+    Process pool entry point; a module-level function so it can be pickled.
+    """
+    name, values, weights = job
+    return name, describe_features(values, weights)
+
+
+def _profile_table(profiles):
+    """
+    Combines (playlist name -> statistics matrix) into one DataFrame.
+    """
+    import pandas as pd
+
+    frames = {
+        name: pd.DataFrame(statistics, index=STATISTICS, columns=PROFILE_COLUMNS)
+        for name, statistics in profiles.items()
+    }
+    if not frames:
+        index = pd.MultiIndex.from_arrays([[], []], names=["playlist", "statistic"])
+        return pd.DataFrame(columns=PROFILE_COLUMNS, index=index)
+    return pd.concat(frames, names=["playlist", "statistic"])
+
+
+def analyze_playlists(
+    playlists,
+    store=None,
+    fetch=True,
+    weights=None,
+    fetch_workers=DEFAULT_FETCH_WORKERS,
+    profile_workers=None,
+):
+    """
+    Fetches and profiles many playlists concurrently.
+
+    Playlists that fail to fetch, load, store or profile are reported and
+    left out of the table, so one removed playlist does not stop a whole batch.
+
+    Args:
+        playlists (dict): Playlist name to Spotify playlist ID. The name is
+            used in the feature store and in the profile table.
+        store (FeatureStore): Store the playlists are written to (or read
+            from). Defaults to the store in `STORE_PATH`.
+        fetch (bool): Fetch the playlists from the API. When False, the
+            playlists are read from the store instead.
+        weights (str): Optional column weighting every track, e.g. "popularity".
+        fetch_workers (int): Number of playlists fetched at the same time.
+        profile_workers (int): Number of profiling processes. Defaults to the
+            number of CPUs; 0 profiles in the calling process.
+
+    Returns:
+        tuple: The profile DataFrame, indexed by (playlist, statistic) with one
+        column per entry of `PROFILE_COLUMNS`, and a dict mapping the names of
+        the failed playlists to their exception.
+    """
+    from fetch_playlist_data import fetch_playlist_features, playlist_to_store
+    from track_records import track_columns
+
+    store = FeatureStore() if store is None else store
+    profile_workers = os.cpu_count() if profile_workers is None else profile_workers
+    profiles = {}
+    failed = {}
+
+    def fail(name, step, error):
+        print(f"Failed to {step} {name}: {error!r}")
+        failed[name] = error
+
+    def playlist_columns():
+        """
+        Yields (name, columns) for every playlist as soon as it is available.
+        """
+        if not fetch:
+            for name in playlists:
+                try:
+                    columns = store.load(columns=PROFILE_COLUMNS, playlist=name)
+                except Exception as error:
+                    fail(name, "load", error)
+                    continue
+                yield name, columns
+            return
+        with ThreadPoolExecutor(max_workers=fetch_workers) as fetch_pool:
+            futures = {
+                fetch_pool.submit(fetch_playlist_features, playlist_id): name
+                for name, playlist_id in playlists.items()
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    tracks = future.result()
+                except Exception as error:
+                    fail(name, "fetch", error)
+                    continue
+                try:
+                    # The store is only written from this thread
+                    playlist_to_store(tracks, name, store=store)
+                except Exception as error:
+                    fail(name, "store", error)
+                    continue
+                yield name, track_columns(tracks)
+
+    def profile_jobs():
+        """
+        Yields the profiling job of every playlist whose columns could be loaded.
+        """
+        for name, columns in playlist_columns():
+            try:
+                yield name, *profile_values(columns, weights)
+            except Exception as error:
+                fail(name, "profile", error)
+
+    if profile_workers == 0:
+        for job in profile_jobs():
+            try:
+                profiles[job[0]] = _describe(job)[1]
+            except Exception as error:
+                fail(job[0], "profile", error)
+    else:
+        # Workers are spawned rather than forked, since forking while the fetch
+        # threads hold locks can deadlock the child processes
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=profile_workers, mp_context=context) as profile_pool:
+            futures = {
+                profile_pool.submit(_describe, job): job[0] for job in profile_jobs()
+            }
+            for future, name in futures.items():
+                try:
+                    profiles[name] = future.result()[1]
+                except Exception as error:
+                    fail(name, "profile", error)
+
+    # Keep the order in which the playlists were passed
+    ordered = {name: profiles[name] for name in playlists if name in profiles}
+    return _profile_table(ordered), failed
+
+
+def _sketch_rows(job):
+    """
+    Process pool entry point: sketches a range of rows of the store or of a playlist.
+    """
+    store_path, playlist, start, stop, weights, chunk_size, compression = job
+    stats = StreamingStats(len(PROFILE_COLUMNS), compression)
+    columns = PROFILE_COLUMNS if weights is None else [*PROFILE_COLUMNS, weights]
+    chunks = FeatureStore(store_path).iter_chunks(
+        columns, playlist=playlist, chunk_size=chunk_size, start=start, stop=stop
+    )
+    for chunk in chunks:
+        stats.update(*profile_values(chunk, weights))
+    return stats
+
+
+def profile_catalogue(
+    playlists=None,
+    store_path=STORE_PATH,
+    weights=None,
+    chunk_size=DEFAULT_CHUNK_SIZE,
+    compression=DEFAULT_COMPRESSION,
+    workers=None,
+):
+    """
+    Profiles the whole feature store or several playlists together in bounded memory.
+
+    The rows are split into one range per worker and read in chunks, so no
+    worker holds more than `chunk_size` tracks at once. Tracks that appear in
+    several of the playlists are counted once per playlist. Restricting the
+    rows to playlists needs the store's track ID index in every worker.
+
+    Args:
+        playlists (list): Names of the playlists to profile together, e.g.
+            all playlists of a genre. Defaults to every track in the store.
+        store_path (str): Directory of the feature store.
+        weights (str): Optional column weighting every track, e.g. "popularity".
+        chunk_size (int): Maximum number of rows read at once.
+        compression (int): t-digest compression (see `feature_stats.TDigest`).
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs; 0 profiles in the calling process.
+
+    Returns:
+        tuple: DataFrame with the statistics of `PROFILE_COLUMNS`, indexed by
+        `STATISTICS`, and the merged `StreamingStats` sketch.
+    """
+    import pandas as pd
+
+    store = FeatureStore(store_path)
+    workers = os.cpu_count() if workers is None else workers
+    if playlists is None:
+        sources = [(None, len(store))]
+    else:
+        sources = [(name, len(store.playlist_ids(name))) for name in playlists]
+    jobs = []
+    for playlist, size in sources:
+        step = max(math.ceil(size / max(workers, 1)), chunk_size)
+        for start in range(0, size, step):
+            jobs.append(
+                (store_path, playlist, start, start + step, weights, chunk_size, compression)
+            )
+
+    stats = StreamingStats(len(PROFILE_COLUMNS), compression)
+    if workers == 0:
+        for sketch in map(_sketch_rows, jobs):
+            stats.merge(sketch)
+    else:
+        # Spawned for the same reason as the workers of `analyze_playlists`
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            for sketch in pool.map(_sketch_rows, jobs):
+                stats.merge(sketch)
+
+    profile = pd.DataFrame(stats.describe(), index=STATISTICS, columns=PROFILE_COLUMNS)
+    return profile, stats
@@ -0,0 +1,66 @@
+"""
+Helpers for splitting work into endpoint-sized batches and running the
+batches concurrently on a bounded thread pool.
+
+The Spotify endpoints that accept several IDs at once cap the number of IDs
+per call (e.g. 100 for audio features, 50 for tracks), so large inputs are
+cut into batches that are requested in parallel through the shared client.
+"""
+
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+# Default number of requests in flight at the same time
+DEFAULT_MAX_WORKERS = 8
+
+
+def chunked(items, size):
+    """
+    Splits an iterable into lists of at most `size` items.
+
+    Works on generators too: items are consumed lazily, one batch at a time.
+
+    Args:
+        items (iterable): The items to split.
+        size (int): The maximum number of items per batch.
+
+    Yields:
+        list: The next batch of items.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def map_batches(fn, items, batch_size, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Calls `fn` on batches of `items` concurrently and yields the results in order.
+
+    Batches are submitted while the input is still being consumed, so work
+    starts before a lazily produced input (e.g. a paginated fetch) is
+    exhausted. At most `2 * max_workers` batches are pending at any time.
+
+    Args:
+        fn (callable): Called with one batch (a list) per call.
+        items (iterable): The items to split into batches.
+        batch_size (int): The maximum number of items per batch.
+        max_workers (int): The maximum number of concurrent calls.
+
+    Yields:
+        tuple: `(batch, fn(batch))` for every batch, in input order.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        for batch in chunked(items, batch_size):
+            pending.append((batch, executor.submit(fn, batch)))
+            # Bound the number of queued batches to keep memory flat
+            if len(pending) >= 2 * max_workers:
+                done_batch, future = pending.popleft()
+                yield done_batch, future.result()
+        while pending:
+            done_batch, future = pending.popleft()
+            yield done_batch, future.result()
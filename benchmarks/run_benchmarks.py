@@ -0,0 +1,249 @@
+"""
+End-to-end benchmarks of the data pipelines against the local Spotify stub.
+
+Measures wall-clock latency and throughput of:
+- playlist: playlist tracks -> audio features -> CSV and feature store
+  (`fetch_playlist_data`).
+- moods: keyword searches -> track info -> mood store (`classify_mood`).
+- artists: breadth-first related-artists crawl (`artist_graph`).
+
+Every pipeline runs through the shared `spotify_client`, pointed at a
+`StubServer` started in the same process, so the numbers include the real
+connection pooling, rate limiting and retry logic. Run from the repository
+root, e.g.
+
+    python benchmarks/run_benchmarks.py --latency 0.05 --error-rate 0.02
+
+Append `--json results.json` to keep the numbers for comparing two revisions,
+and `--metrics metrics.prom` (or `metrics.json`) for the per-endpoint metrics.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCHMARK_DIR)
+
+from stub_server import StubConfig, StubServer, spotify_id  # noqa: E402
+
+import spotify_client  # noqa: E402
+from metrics import get_metrics  # noqa: E402
+from rate_limiter import DEFAULT_BURST, DEFAULT_RATE, RateLimiter  # noqa: E402
+
+PIPELINES = ["playlist", "moods", "artists"]
+
+# Playlist ID requested by the playlist benchmark; the stub serves any ID
+BENCHMARK_PLAYLIST = "3djIt439HKrISGRydpmNWn"
+
+
+def playlist_pipeline(args, workdir):
+    """
+    Fetches a playlist with its audio features and writes it to CSV and the feature store.
+    """
+    import fetch_playlist_data
+    from feature_store import FeatureStore
+
+    store = FeatureStore(os.path.join(workdir, "bench_feature_store"))
+
+    def run():
+        tracks = fetch_playlist_data.fetch_playlist_features(BENCHMARK_PLAYLIST)
+        fetch_playlist_data.playlist_to_csv(tracks, os.path.join(workdir, "bench_playlist"))
+        fetch_playlist_data.playlist_to_store(tracks, "bench_playlist", store=store)
+        return len(tracks)
+
+    return run
+
+
+def mood_pipeline(args, workdir):
+    """
+    Runs every mood keyword search, fetches the track info and appends it to a mood store.
+    """
+    import classify_mood
+    from mood_store import MoodStore
+
+    store = MoodStore(os.path.join(workdir, "bench_moods.sqlite"))
+
+    def run():
+        mood_songs = classify_mood.get_mood_songs(max_workers=args.workers)
+        df_dict, _ = classify_mood.to_pd(mood_songs)
+        classify_mood.write_moods(df_dict, store=store)
+        return sum(len(df) for df in df_dict.values())
+
+    return run
+
+
+def artist_pipeline(args, workdir):
+    """
+    Crawls the related-artists graph from a few seed artists.
+    """
+    from artist_graph import crawl_related_artists
+
+    seed_ids = [spotify_id("artist", seed) for seed in range(args.seeds)]
+
+    def run():
+        graph = crawl_related_artists(
+            seed_ids, depth=args.depth, max_workers=args.workers
+        )
+        return len(graph)
+
+    return run
+
+
+BENCHMARKS = {
+    "playlist": playlist_pipeline,
+    "moods": mood_pipeline,
+    "artists": artist_pipeline,
+}
+
+
+def measure(name, run, server, repeat):
+    """
+    Runs a pipeline `repeat` times and summarizes the timings and request counts.
+
+    Returns:
+        dict: Latency of the runs in seconds, the items processed per run and
+            the request, item and byte throughput of the median run.
+    """
+    timings, items, requests_sent, throttled, bytes_sent = [], [], [], [], []
+    for _ in range(repeat):
+        server.stats.reset()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            items.append(run())
+        timings.append(time.perf_counter() - start)
+        stats = server.stats.snapshot()
+        requests_sent.append(stats["total_requests"])
+        throttled.append(stats["throttled"])
+        bytes_sent.append(stats["bytes_sent"])
+
+    median = statistics.median(timings)
+    return {
+        "pipeline": name,
+        "runs": repeat,
+        "latency_min_s": min(timings),
+        "latency_median_s": median,
+        "latency_max_s": max(timings),
+        "items": statistics.median(items),
+        "requests": statistics.median(requests_sent),
+        "throttled": statistics.median(throttled),
+        "items_per_s": statistics.median(items) / median,
+        "requests_per_s": statistics.median(requests_sent) / median,
+        "mib_per_s": statistics.median(bytes_sent) / median / 2**20,
+    }
+
+
+def print_results(results):
+    header = (
+        f"{'pipeline':<10}{'median s':>10}{'min s':>9}{'max s':>9}"
+        f"{'items':>9}{'items/s':>10}{'requests':>10}{'req/s':>9}{'429s':>7}{'MiB/s':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result['pipeline']:<10}{result['latency_median_s']:>10.3f}"
+            f"{result['latency_min_s']:>9.3f}{result['latency_max_s']:>9.3f}"
+            f"{result['items']:>9.0f}{result['items_per_s']:>10.1f}"
+            f"{result['requests']:>10.0f}{result['requests_per_s']:>9.1f}"
+            f"{result['throttled']:>7.0f}{result['mib_per_s']:>8.2f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipelines against a local Spotify stub")
+    parser.add_argument(
+        "pipelines", nargs="*", help=f"Pipelines to run, out of {PIPELINES} (default: all)"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per pipeline")
+    parser.add_argument("--playlist-size", type=int, default=1000, help="Tracks per playlist")
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub response delay in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Extra random delay in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=0.1, help="Retry-After of the 429s")
+    parser.add_argument("--related-artists", type=int, default=20, help="Related artists per artist")
+    parser.add_argument("--seeds", type=int, default=5, help="Seed artists of the crawl")
+    parser.add_argument("--depth", type=int, default=2, help="Depth of the crawl")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent requests")
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="Client rate limit in requests per second; 0 disables it",
+    )
+    parser.add_argument("--json", help="Also write the results to this JSON file")
+    parser.add_argument(
+        "--metrics",
+        help="Write the per-endpoint metrics of all runs to this file "
+        "(Prometheus text format for .prom, JSON otherwise)",
+    )
+    args = parser.parse_args(argv)
+    args.pipelines = args.pipelines or PIPELINES
+    unknown = set(args.pipelines) - set(PIPELINES)
+    if unknown:
+        parser.error(f"unknown pipelines: {sorted(unknown)}")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    config = StubConfig(
+        playlist_size=args.playlist_size,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        related_artists=args.related_artists,
+    )
+    # The token request goes to the stub, which accepts any credentials
+    os.environ.setdefault("CLIENT_ID", "benchmark")
+    os.environ.setdefault("CLIENT_SECRET", "benchmark")
+    if args.rate > 0:
+        rate_limiter = RateLimiter(rate=args.rate, burst=DEFAULT_BURST)
+    else:
+        rate_limiter = RateLimiter(rate=1e9, burst=1e9)
+
+    results = []
+    with StubServer(config) as server, tempfile.TemporaryDirectory() as workdir:
+        spotify_client.configure(
+            api_base_url=server.api_base_url,
+            token_url=server.token_url,
+            rate_limiter=rate_limiter,
+            cache=None,
+        )
+        cwd = os.getcwd()
+        # Files written by the pipelines end up in the temporary directory
+        os.chdir(workdir)
+        try:
+            for name in args.pipelines:
+                # Setup (including module imports) is not part of the timings
+                run = BENCHMARKS[name](args, workdir)
+                results.append(measure(name, run, server, args.repeat))
+        finally:
+            os.chdir(cwd)
+            spotify_client.get_client().close()
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as file:
+            json.dump({"settings": vars(args), "results": results}, file, indent=2)
+    if args.metrics:
+        metrics = get_metrics()
+        with open(args.metrics, "w", encoding="utf-8") as file:
+            if args.metrics.endswith(".prom"):
+                file.write(metrics.to_prometheus())
+            else:
+                file.write(metrics.to_json())
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""
+Local stand-in for the Spotify Web API, used by the benchmarks.
+
+Serves deterministic, realistically shaped payloads for every endpoint the
+project uses (token, playlist tracks, tracks, audio features, search, related
+artists, recommendations, genre seeds, markets and playlist creation). The
+size of the payloads, the latency of every response and the share of 429
+responses are configurable, so pipelines can be measured without credentials
+or network access.
+
+Run standalone with `python benchmarks/stub_server.py --port 8765`.
+"""
+
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+AUDIO_FEATURE_RANGES = {
+    "danceability": (0.0, 1.0),
+    "energy": (0.0, 1.0),
+    "loudness": (-60.0, 0.0),
+    "speechiness": (0.0, 1.0),
+    "acousticness": (0.0, 1.0),
+    "instrumentalness": (0.0, 1.0),
+    "liveness": (0.0, 1.0),
+    "valence": (0.0, 1.0),
+    "tempo": (50.0, 200.0),
+}
+GENRES = ["afrobeat", "drum-and-bass", "house", "jazz", "reggaeton", "salsa", "soul"]
+MARKETS = ["BE", "BR", "ES", "FR", "JP", "NL", "US", "ZA"]
+
+
+def spotify_id(*parts):
+    """
+    Returns a deterministic 22-character base62-like ID for the given parts.
+    """
+    digest = hashlib.sha1("/".join(map(str, parts)).encode("utf-8")).hexdigest()
+    return digest[:22]
+
+
+def track_object(track_id):
+    rng = random.Random(track_id)
+    artist_id = spotify_id("artist", rng.randrange(100000))
+    return {
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "name": f"Track {track_id[:8]}",
+        "popularity": rng.randrange(101),
+        "duration_ms": rng.randrange(120000, 420000),
+        "artists": [{"id": artist_id, "name": f"Artist {artist_id[:8]}"}],
+        "album": {"id": spotify_id("album", track_id), "name": f"Album {track_id[:6]}"},
+    }
+
+
+def audio_features_object(track_id):
+    rng = random.Random("features" + track_id)
+    features = {
+        feature: round(rng.uniform(low, high), 4)
+        for feature, (low, high) in AUDIO_FEATURE_RANGES.items()
+    }
+    features.update({"id": track_id, "type": "audio_features", "key": rng.randrange(12)})
+    return features
+
+
+def artist_object(artist_id):
+    rng = random.Random(artist_id)
+    return {
+        "id": artist_id,
+        "name": f"Artist {artist_id[:8]}",
+        "popularity": rng.randrange(101),
+        "genres": rng.sample(GENRES, 2),
+    }
+
+
+class StubConfig:
+    """
+    Behaviour of the stub server.
+
+    Args:
+        playlist_size (int): Number of tracks in every playlist.
+        latency (float): Seconds every response is delayed by.
+        jitter (float): Extra random delay of up to this many seconds.
+        error_rate (float): Share of API responses answered with 429.
+        retry_after (float): Retry-After value of the 429 responses, in seconds.
+        related_artists (int): Number of related artists per artist.
+    """
+
+    def __init__(
+        self,
+        playlist_size=1000,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        retry_after=0.0,
+        related_artists=20,
+    ):
+        self.playlist_size = playlist_size
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self.related_artists = related_artists
+
+
+class StubStats:
+    """
+    Thread-safe counters of the requests served, per endpoint.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.throttled = 0
+            self.bytes_sent = 0
+
+    def record(self, endpoint, size, throttled):
+        with self._lock:
+            self.requests[endpoint] = self.requests.get(endpoint, 0) + 1
+            self.bytes_sent += size
+            self.throttled += throttled
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "requests": dict(self.requests),
+                "total_requests": sum(self.requests.values()),
+                "throttled": self.throttled,
+                "bytes_sent": self.bytes_sent,
+            }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, endpoint, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+        self.server.stats.record(endpoint, len(data), status == 429)
+
+    def _handle(self, method):
+        config = self.server.config
+        parts = urlsplit(self.path)
+        query = dict(parse_qsl(parts.query))
+        segments = [segment for segment in parts.path.split("/") if segment]
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        delay = config.latency + random.uniform(0, config.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if segments[:2] == ["api", "token"]:
+            return self._send(
+                "token",
+                200,
+                {"access_token": "stub-token", "token_type": "Bearer", "expires_in": 3600},
+            )
+        if not segments or segments[0] != "v1" or len(segments) < 2:
+            return self._send("unknown", 404, {"error": {"status": 404}})
+
+        segments = segments[1:]
+        endpoint = segments[0]
+        if config.error_rate and random.random() < config.error_rate:
+            return self._send(
+                endpoint,
+                429,
+                {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                {"Retry-After": str(config.retry_after)},
+            )
+        handler = getattr(self, "_" + endpoint.replace("-", "_"), None)
+        if handler is None:
+            return self._send(endpoint, 404, {"error": {"status": 404}})
+        status, payload = handler(method, segments, query, body)
+        return self._send(endpoint, status, payload)
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _playlists(self, method, segments, query, body):
+        playlist_id = segments[1]
+        created = self.server.created.get(playlist_id)
+        if method == "POST":
+            if created is not None:
+                with self.server.lock:
+                    created["uris"].extend(json.loads(body or b"{}").get("uris", []))
+            return 201, {"snapshot_id": spotify_id("snapshot", time.time())}
+        offset = int(query.get("offset", 0))
+        limit = min(int(query.get("limit", 100)), 100)
+        if created is not None:
+            # Playlists created through the stub hold the tracks added to them
+            ids = [uri.rsplit(":", 1)[-1] for uri in created["uris"]]
+        else:
+            ids = [
+                spotify_id(playlist_id, position)
+                for position in range(self.server.config.playlist_size)
+            ]
+        total = len(ids)
+        items = [{"track": track_object(id)} for id in ids[offset : offset + limit]]
+        has_next = offset + limit < total
+        return 200, {
+            "items": items,
+            "total": total,
+            "next": f"/v1/playlists/{playlist_id}/tracks?offset={offset + limit}" if has_next else None,
+        }
+
+    def _tracks(self, method, segments, query, body):
+        if len(segments) > 1:
+            return 200, track_object(segments[1])
+        ids = [id for id in query.get("ids", "").split(",") if id][:50]
+        return 200, {"tracks": [track_object(id) for id in ids]}
+
+    def _audio_features(self, method, segments, query, body):
+        ids = [id for id in query.get("ids", "").split(",") if id][:100]
+        return 200, {"audio_features": [audio_features_object(id) for id in ids]}
+
+    def _search(self, method, segments, query, body):
+        limit = int(query.get("limit", 20))
+        key = (query.get("q", ""), query.get("market", ""))
+        if query.get("type") == "artist":
+            items = [artist_object(spotify_id("search-artist", *key, i)) for i in range(limit)]
+            return 200, {"artists": {"items": items}}
+        items = [track_object(spotify_id("search", *key, i)) for i in range(limit)]
+        return 200, {"tracks": {"items": items}}
+
+    def _artists(self, method, segments, query, body):
+        artist_id = segments[1]
+        rng = random.Random(artist_id)
+        # Related artists are drawn from a bounded pool, so crawls revisit artists
+        related = [
+            artist_object(spotify_id("artist", rng.randrange(100000)))
+            for _ in range(self.server.config.related_artists)
+        ]
+        return 200, {"artists": related}
+
+    def _recommendations(self, method, segments, query, body):
+        if segments[-1] == "available-genre-seeds":
+            return 200, {"genres": GENRES}
+        limit = min(int(query.get("limit", 20)), 100)
+        key = (query.get("seed_genres", ""), query.get("market", ""))
+        tracks = [track_object(spotify_id("recommendation", *key, i)) for i in range(limit)]
+        return 200, {"tracks": tracks, "seeds": []}
+
+    def _markets(self, method, segments, query, body):
+        return 200, {"markets": MARKETS}
+
+    def _users(self, method, segments, query, body):
+        user_id = segments[1]
+        if method == "GET":
+            offset = int(query.get("offset", 0))
+            limit = min(int(query.get("limit", 20)), 50)
+            owned = [
+                {
+                    "id": playlist_id,
+                    "name": playlist["name"],
+                    "owner": {"id": user_id},
+                    "tracks": {"total": len(playlist["uris"])},
+                }
+                for playlist_id, playlist in list(self.server.created.items())
+                if playlist["owner"] == user_id
+            ]
+            has_next = offset + limit < len(owned)
+            return 200, {
+                "items": owned[offset : offset + limit],
+                "total": len(owned),
+                "next": f"/v1/users/{user_id}/playlists?offset={offset + limit}" if has_next else None,
+            }
+        name = json.loads(body or b"{}").get("name", "")
+        with self.server.lock:
+            playlist_id = spotify_id("playlist", user_id, name, len(self.server.created))
+            self.server.created[playlist_id] = {"name": name, "owner": user_id, "uris": []}
+        return 201, {"id": playlist_id, "name": name}
+
+
+class StubServer:
+    """
+    Runs the stub in a background thread.
+
+    Args:
+        config (StubConfig): Behaviour of the server.
+        host (str): Interface to bind to.
+        port (int): Port to bind to; 0 picks a free port.
+    """
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.httpd = ThreadingHTTPServer((host, port), StubHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.config = config or StubConfig()
+        self.httpd.stats = StubStats()
+        # Playlists created through the stub, by ID
+        self.httpd.created = {}
+        self.httpd.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def config(self):
+        return self.httpd.config
+
+    @property
+    def stats(self):
+        return self.httpd.stats
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_base_url(self):
+        return self.url + "/v1"
+
+    @property
+    def token_url(self):
+        return self.url + "/api/token"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Spotify Web API stub")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--playlist-size", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = StubConfig(
+        playlist_size=args.playlist_size,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+    )
+    server = StubServer(config, host=args.host, port=args.port)
+    print(f"Serving the Spotify stub on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Headless rendering of the playlist and artist charts.
+
+Figures are built as `matplotlib.figure.Figure` objects on the Agg canvas
+instead of through pyplot, so rendering needs no display, never blocks on a
+window and keeps no global figure state. All audio feature box plots of a
+playlist are drawn as one grid of subplots and written as PNG and/or SVG
+files; many playlists can be rendered in parallel worker processes.
+"""
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from feature_store import STORE_PATH
+from metrics import timed
+
+# Output formats supported by `save_figure`
+FORMATS = ("png", "svg")
+# Number of subplot columns of a profile grid
+GRID_COLUMNS = 5
+# Size in inches of one subplot of a profile grid
+SUBPLOT_SIZE = (3.2, 3.6)
+
+
+def _profile_columns(playlist_data):
+    return [column for column in playlist_data if column not in ["name", "id"]]
+
+
+def draw_profile(figure, playlist_data, descriptive_stats, columns=GRID_COLUMNS):
+    """
+    Draws a box plot with its median, mean and quartiles for every audio feature.
+
+    Args:
+        figure (matplotlib.figure.Figure): Figure to draw on, one subplot per feature.
+        playlist_data (DataFrame): The playlist's tracks and audio features.
+        descriptive_stats (DataFrame): Statistics from `audio_values_range`,
+            with one column per feature.
+        columns (int): Number of subplot columns.
+    """
+    features = _profile_columns(playlist_data)
+    columns = max(min(columns, len(features)), 1)
+    rows = math.ceil(len(features) / columns)
+    for position, feature in enumerate(features, start=1):
+        ax = figure.add_subplot(rows, columns, position)
+        values = playlist_data[feature].dropna().to_numpy()
+        stats = descriptive_stats[feature]
+        ax.boxplot(
+            values,
+            positions=[0],
+            widths=0.3,
+            patch_artist=True,
+            boxprops={"facecolor": "lightblue"},
+            medianprops={"color": "black"},
+        )
+        ax.scatter(x=0, y=stats["Median"], color="red", zorder=5, label="Median")
+        ax.scatter(x=0, y=stats["mean"], color="blue", zorder=5, label="Mean")
+        for quartile in ["Q1", "Q3"]:
+            ax.text(
+                x=0.4,
+                y=stats[quartile],
+                s=f"{quartile}\n{stats[quartile]:.2f}",
+                color="green",
+                verticalalignment="center",
+            )
+        ax.set_xlim(-0.5, 1)
+        ax.set_xticks([])
+        ax.set_title(feature)
+        ax.grid(True, which="both", linestyle="--", linewidth=0.5, axis="y")
+    if features:
+        handles, labels = figure.axes[0].get_legend_handles_labels()
+        figure.legend(handles, labels, loc="upper right", ncols=2)
+
+
+def profile_figure(playlist_data, descriptive_stats, title=None, columns=GRID_COLUMNS):
+    """
+    Returns a headless figure with the box plot grid of a playlist (see `draw_profile`).
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    features = _profile_columns(playlist_data)
+    columns = max(min(columns, len(features)), 1)
+    rows = max(math.ceil(len(features) / columns), 1)
+    figure = Figure(figsize=(SUBPLOT_SIZE[0] * columns, SUBPLOT_SIZE[1] * rows))
+    FigureCanvasAgg(figure)
+    # Fixed margins, since constrained layout measures every label again on each save
+    figure.subplots_adjust(left=0.05, right=0.98, bottom=0.04, top=0.9, wspace=0.35, hspace=0.3)
+    draw_profile(figure, playlist_data, descriptive_stats, columns)
+    if title:
+        figure.suptitle(title)
+    return figure
+
+
+def draw_popularity(ax, artists_data):
+    """
+    Draws the popularity score of the artists against their ranking.
+
+    Args:
+        ax (matplotlib.axes.Axes): Axes to draw on.
+        artists_data (DataFrame): Artists with a "Popularity" column, in ranking order.
+    """
+    ax.scatter(artists_data.index, artists_data["Popularity"], color="g")
+    ax.set_xlabel("Position in the ranking")
+    ax.set_ylabel("Popularity Score")
+
+
+def popularity_figure(artists_data):
+    """
+    Returns a headless figure of the artist popularity (see `draw_popularity`).
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(8, 5), layout="constrained")
+    FigureCanvasAgg(figure)
+    draw_popularity(figure.add_subplot(), artists_data)
+    return figure
+
+
+def save_figure(figure, path, formats=("png",), dpi=100):
+    """
+    Writes a figure once per format.
+
+    Args:
+        figure (matplotlib.figure.Figure): The figure to write.
+        path (str): Output path. An extension from `FORMATS` is replaced by
+            the extension of each format.
+        formats (sequence): Formats from `FORMATS`.
+        dpi (int): Resolution of the PNG files.
+
+    Returns:
+        list: The paths of the written files.
+    """
+    base, extension = os.path.splitext(path)
+    if extension.lstrip(".").lower() not in FORMATS:
+        base = path
+    directory = os.path.dirname(base)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    paths = []
+    for file_format in formats:
+        if file_format not in FORMATS:
+            raise ValueError(f"Unsupported chart format: {file_format}")
+        paths.append(f"{base}.{file_format}")
+        figure.savefig(paths[-1], format=file_format, dpi=dpi)
+    return paths
+
+
+def render_playlist(name, output_dir=".", formats=("png",), store_path=STORE_PATH, weights=None):
+    """
+    Renders the profile chart of a playlist in the feature store.
+
+    Only the store path is passed in, so the function can run in a worker
+    process that loads the playlist itself.
+
+    Args:
+        name (str): Name of the playlist in the feature store.
+        output_dir (str): Directory the chart is written to, as `<name>.<format>`.
+        formats (sequence): Formats from `FORMATS`.
+        store_path (str): Directory of the feature store.
+        weights (str): Optional column weighting the statistics per track.
+
+    Returns:
+        list: The paths of the written files.
+    """
+    from analyze_playlist_audio_features import playlist_profile
+    from feature_store import FeatureStore
+
+    playlist_data, descriptive_stats = playlist_profile(
+        name, store=FeatureStore(store_path), weights=weights
+    )
+    figure = profile_figure(playlist_data, descriptive_stats, title=name)
+    return save_figure(figure, os.path.join(output_dir, name), formats)
+
+
+@timed("charts.render")
+def render_playlists(
+    names, output_dir=".", formats=("png",), store_path=STORE_PATH, weights=None, workers=None
+):
+    """
+    Renders the profile charts of many playlists in parallel worker processes.
+
+    Playlists that fail to render are reported and skipped, so one missing
+    playlist does not stop the others.
+
+    Args:
+        names (sequence): Names of the playlists in the feature store.
+        output_dir (str): Directory the charts are written to.
+        formats (sequence): Formats from `FORMATS`.
+        store_path (str): Directory of the feature store.
+        weights (str): Optional column weighting the statistics per track.
+        workers (int): Number of worker processes. Defaults to the number of
+            CPUs; 0 renders in the calling process.
+
+    Returns:
+        tuple: A dict mapping each rendered playlist to the paths of its
+        files, and a dict mapping the failed playlists to their exception.
+    """
+    rendered = {}
+    failed = {}
+    args = (output_dir, tuple(formats), store_path, weights)
+    if workers == 0:
+        results = {name: _call(render_playlist, name, *args) for name in names}
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {name: pool.submit(render_playlist, name, *args) for name in names}
+            results = {name: _call(future.result) for name, future in futures.items()}
+
+    for name, (paths, error) in results.items():
+        if error is None:
+            rendered[name] = paths
+        else:
+            print(f"Failed to render {name}: {error!r}")
+            failed[name] = error
+    return rendered, failed
+
+
+def _call(func, *args):
+    """
+    Returns (result, None) or (None, exception) of a call.
+    """
+    try:
+        return func(*args), None
+    except Exception as error:
+        return None, error
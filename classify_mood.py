@@ -9,15 +9,14 @@ various emotional states or settings.
 
 from dotenv import load_dotenv
 import os
-from requests import post, get
+from spotify_client import get, post
 import base64
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
-import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Import Spotify API token and headers for authentication
-from init_spotify_api import token, headers
+from metrics import timed
+from mood_store import MoodStore
+from response_json import TrackSearch, decode
 from search_tracks import single_song_info, multiple_song_info
 
 # Define mood categories and associated search keywords
@@ -70,43 +69,76 @@ mood_search_terms = {
 market_list = ["US", "ES", "JP", "CN", "SA", "FR", "BR", "NL", "ZA"]
 
 
+# Number of tracks requested per keyword and market
+SEARCH_LIMIT = 3
+# Maximum number of search requests in flight at the same time
+MOOD_SEARCH_WORKERS = 8
+
+
+def search_track_ids(keyword, market, limit=SEARCH_LIMIT, headers=None):
+    """
+    Searches tracks for a keyword in one market.
+
+    :param keyword: The search query.
+    :param market: ISO 3166-1 alpha-2 country code to search in.
+    :param limit: Number of tracks to return.
+    :param headers: Optional headers overriding the client's authorization.
+    :return: List of the IDs of the found tracks.
+    """
+    params = {"q": keyword, "type": "track", "market": market, "limit": limit}
+    result = get("/search", params=params, headers=headers)
+    result.raise_for_status()
+    # Decoded once per response, keeping only the fields of `TrackSearch`
+    page = decode(result, TrackSearch).tracks
+    return [item.id for item in page.items if item] if page else []
+
+
 # Gets 5 songs for each mood
-def get_mood_songs(headers=headers, mood_search_terms=mood_search_terms):
+@timed("moods.search")
+def get_mood_songs(
+    headers=None,
+    mood_search_terms=mood_search_terms,
+    max_workers=MOOD_SEARCH_WORKERS,
+):
     """
     Fetches songs that match the mood search terms from various markets.
 
-    :param headers: Authorization headers for Spotify API requests.
+    Every (keyword, market) search is issued concurrently on a thread pool of
+    at most `max_workers` requests, and the results are merged per mood.
+
+    :param headers: Optional headers overriding the client's authorization.
     :param mood_search_terms: Dictionary mapping moods to lists of search keywords.
-    :return: Dictionary mapping moods to lists of track IDs.
+    :param max_workers: Maximum number of search requests in flight at the same time.
+    :return: Dictionary mapping moods to lists of unique track IDs, in search order.
     """
-    url = "https://api.spotify.com/v1/search"
-    mood_track_ids = {}
-    # loop over moods
-    for mood, search_t in mood_search_terms.items():
-        print(search_t)
-        mood_track_ids[mood] = []
-        # loop over keyword in each mood
-        for keyword in mood_search_terms[mood]:
-            for market in market_list:
-                # create query
-                query_url = url + f"?q={keyword}&type=track&market={market}&limit=3"
-                result = get(query_url, headers=headers)
-                # dict -> dict -> list -> dict
-                # get 5 ID's -> name and other info get later
-                for nr in range(3):
-                    track_id = json.loads(result.content)["tracks"]["items"][nr]["id"]
-                    print(track_id)
-
-                    # check for duplicates
-                    if track_id not in mood_track_ids[mood]:
-                        mood_track_ids[mood].append(track_id)
-        time.sleep(2)  # Respectful pause to avoid rate limits
-
-    # Check if ID's have been passed
-    # print(mood_track_ids["Sunset Serenade"])
+    queries = [
+        (mood, keyword, market)
+        for mood, keywords in mood_search_terms.items()
+        for keyword in keywords
+        for market in market_list
+    ]
+
+    def search(query):
+        _, keyword, market = query
+        return search_track_ids(keyword, market, headers=headers)
+
+    mood_track_ids = {mood: [] for mood in mood_search_terms}
+    seen_ids = {mood: set() for mood in mood_search_terms}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # map keeps the query order, so the merged lists are deterministic
+        for (mood, _, _), track_ids in zip(queries, executor.map(search, queries)):
+            for track_id in track_ids:
+                # check for duplicates
+                if track_id not in seen_ids[mood]:
+                    seen_ids[mood].add(track_id)
+                    mood_track_ids[mood].append(track_id)
+
+    for mood, track_ids in mood_track_ids.items():
+        print(f"{mood}: {len(track_ids)} tracks")
     return mood_track_ids
 
 
+@timed("moods.track_info")
 def to_pd(mood_track_ids):
     """
     Converts mood_track_ids to a Pandas DataFrame for further processing.
@@ -114,93 +146,57 @@ def to_pd(mood_track_ids):
     :param mood_track_ids: Dictionary of mood categories to track IDs.
     :return: A dictionary of DataFrames for each mood and a combined DataFrame.
     """
+    import pandas as pd
+
     df_dict = {}
     for mood in mood_track_ids:
         print(f"Creating {mood} Data Dictionary...")
-        data_dict = {"Section": [], "Song Name": [], "Artist Name": []}
-        id_list = []
-
-        print("Gathering ID's...")
-        for id in mood_track_ids[mood]:
-            id_list.append(str(id))
+        id_list = [str(id) for id in mood_track_ids[mood]]
 
         print("Fetching Song Name & Artist Name...")
-        song_name, artist_name = multiple_song_info(
-            token=token, headers=headers, ids=id_list
-        )
-        data_dict["Section"].append(mood)
-        data_dict["Song Name"].append(song_name)
-        data_dict["Artist Name"].append(artist_name)
+        songs = multiple_song_info(ids=id_list)
+        data_dict = {
+            "Section": [mood] * len(songs),
+            "Track ID": list(songs.keys()),
+            "Song Name": [song_name for song_name, _ in songs.values()],
+            "Artist Name": [artist_name for _, artist_name in songs.values()],
+        }
 
         dataframe = pd.DataFrame(data_dict)
         df_dict[mood] = dataframe
-        time.sleep(3)
 
     return df_dict, dataframe
 
 
-mood_songs = get_mood_songs()
-
-# Convert track IDs to DataFrames for easier manipulation and visualization
-df_dict, dataframe = to_pd(mood_songs)
-
-# Specify the filepath for saving the mood-based playlists
-filepath = "moods.csv"
-
-# print(dataframe.head())
-
-
-# Writes passed df's to passed filepath
-def write_csv(df_dict, filepath=filepath):
-    append_mode = "a"
-
-    # loop over each mood df in dict
-    for df_name, df in df_dict.items():
-        # initialize last_section value
-        last_section = None
-
-        if not os.path.isfile(filepath):
-            with open(filepath, mode="w", newline="") as csv_file:
-                df.to_csv(csv_file, header=True, index=False)
-        else:
-            existing_data = pd.read_csv(filepath)
-
-            section_positions = {}
-            current_section = None
-
-            for idx, row in existing_data.iterrows():
-                if row["Section"] == "Section":
-                    current_section = row["Section"]
-                    section_positions[current_section] = idx
-
-            if last_section != df_name:
-                append_mode = "w"
-
-            new_songs = df[~df["Song Name"].isin(existing_data["Song Name"])]
-
-            existing_data = pd.concat(
-                [existing_data, new_songs], ignore_index=True, sort=False
-            )
-
-            existing_data.to_csv(filepath, mode=append_mode, header=True, index=False)
-
-        print(f"Appended {df_name} to CSV.")
-
-
-write_csv(df_dict=df_dict)
+# Appends passed df's to the mood store
+@timed("moods.write")
+def write_moods(df_dict, store=None):
+    """
+    Appends the tracks of every mood to the mood store in one atomic commit.
 
+    :param df_dict: Dictionary of mood DataFrames, as returned by `to_pd`.
+    :param store: The MoodStore to write to. Defaults to the store in `MOOD_STORE_PATH`.
+    :return: Dictionary mapping each mood to the number of new tracks.
+    """
+    store = MoodStore() if store is None else store
+    added = store.add(df_dict)
+    for mood, count in added.items():
+        print(f"Appended {count} new {mood} tracks.")
+    return added
 
-# loads csv data into dataframes per mood
-def load_csv(filepath, mood_search_terms):
-    moods_raw = pd.read_csv(filepath, header=0)
-    print(moods_raw.head())
 
-    moods = {}
-    for section in moods_raw["Section"].unique():
-        moods[section] = moods_raw[moods_raw["Section"] == section].copy()
+# loads stored tracks into dataframes per mood
+def load_moods(store=None, moods=None):
+    """
+    Loads the stored tracks of the given moods.
 
-    print(moods)
-    return moods
+    :param store: The MoodStore to read from. Defaults to the store in `MOOD_STORE_PATH`.
+    :param moods: Names of the moods to load. Defaults to every stored mood.
+    :return: Dictionary mapping each mood to its DataFrame.
+    """
+    store = MoodStore() if store is None else store
+    moods = store.moods() if moods is None else moods
+    return {mood: store.load(mood) for mood in moods}
 
 
-# load_csv(filepath=filepath, mood_search_terms=mood_search_terms)
+# load_moods(moods=list(mood_search_terms))
@@ -0,0 +1,379 @@
+"""
+Command line entry point for the Spotify Playlist Remixer.
+
+Every pipeline that used to run as module-level script code is a subcommand:
+
+    python cli.py fetch drum_and_bass          # playlist + audio features -> feature store
+    python cli.py batch --file playlists.txt   # fetch and profile many playlists concurrently
+    python cli.py analyze --playlist afrobeats # audio feature profile of a stored playlist
+    python cli.py plot afrobeats portugues     # headless profile charts, rendered in parallel
+    python cli.py profile                      # streaming profile of every stored track
+    python cli.py moods                        # refresh the mood store from keyword searches
+    python cli.py artists --plot               # top artists and their related artists
+    python cli.py recommend --genre salsa --market US
+    python cli.py create --genre salsa --market US
+
+The project modules, pandas and matplotlib are only imported by the
+commands that need them, so a command starts without loading the libraries
+it never uses.
+"""
+
+import argparse
+import sys
+
+# Defaults of the analyze, recommend and create commands
+DEFAULT_PLAYLIST = "afrobeats"
+DEFAULT_GENRE = "salsa"
+DEFAULT_MARKET = "US"
+
+
+def cmd_fetch(args):
+    """
+    Fetches a playlist with its audio features into the feature store.
+    """
+    from fetch_playlist_data import (
+        PLAYLISTS,
+        fetch_playlist_features,
+        playlist_to_csv,
+        playlist_to_store,
+    )
+
+    playlist_id = PLAYLISTS.get(args.playlist, args.playlist)
+    name = args.name or args.playlist
+    tracks = fetch_playlist_features(playlist_id)
+    if args.csv:
+        playlist_to_csv(tracks, name)
+    playlist_to_store(tracks, name)
+
+
+def _parse_playlists(specs):
+    """
+    Resolves "name=ID", predefined playlist names and bare IDs to a name -> ID dict.
+    """
+    from fetch_playlist_data import PLAYLISTS
+
+    playlists = {}
+    for spec in specs:
+        name, _, playlist_id = spec.partition("=")
+        if not playlist_id:
+            playlist_id = PLAYLISTS.get(name, name)
+        playlists[name] = playlist_id
+    return playlists
+
+
+def cmd_batch(args):
+    """
+    Fetches and profiles many playlists concurrently into one profile table.
+    """
+    from batch_analysis import analyze_playlists
+
+    specs = list(args.playlists)
+    if args.file:
+        with open(args.file, encoding="utf-8") as file:
+            specs.extend(line.strip() for line in file if line.strip() and not line.startswith("#"))
+    profiles, failed = analyze_playlists(
+        _parse_playlists(specs),
+        fetch=not args.no_fetch,
+        weights=args.weights,
+        fetch_workers=args.fetch_workers,
+        profile_workers=args.profile_workers,
+    )
+    profiles.to_csv(args.output)
+    print(f"Wrote {profiles.index.get_level_values(0).nunique()} profiles to {args.output}")
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        return 1
+
+
+def _profile(args):
+    from analyze_playlist_audio_features import playlist_profile
+
+    return playlist_profile(args.playlist, weights=args.weights)
+
+
+def cmd_analyze(args):
+    """
+    Prints the audio feature profile of a stored playlist.
+    """
+    _, audio_metrics = _profile(args)
+    print(audio_metrics.to_string())
+
+
+def cmd_plot(args):
+    """
+    Renders the profile charts of stored playlists to PNG/SVG files.
+    """
+    from charts import render_playlists
+    from feature_store import FeatureStore
+
+    names = args.playlists or FeatureStore().playlists()
+    rendered, failed = render_playlists(
+        names,
+        output_dir=args.output_dir,
+        formats=args.format,
+        weights=args.weights,
+        workers=args.workers,
+    )
+    for paths in rendered.values():
+        print(", ".join(paths))
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        return 1
+
+
+def cmd_profile(args):
+    """
+    Profiles every stored track, or several playlists together, in bounded memory.
+    """
+    import pandas as pd
+
+    from batch_analysis import PROFILE_COLUMNS, profile_catalogue
+    from feature_stats import DEFAULT_COMPRESSION, STATISTICS, StreamingStats
+    from feature_store import DEFAULT_CHUNK_SIZE
+
+    _, stats = profile_catalogue(
+        args.playlists or None,
+        weights=args.weights,
+        chunk_size=args.chunk_size or DEFAULT_CHUNK_SIZE,
+        compression=args.compression or DEFAULT_COMPRESSION,
+        workers=args.workers,
+    )
+    for path in args.merge:
+        with open(path, encoding="utf-8") as file:
+            stats.merge(StreamingStats.from_json(file.read()))
+    if args.save_sketch:
+        with open(args.save_sketch, "w", encoding="utf-8") as file:
+            file.write(stats.to_json())
+
+    profile = pd.DataFrame(stats.describe(), index=STATISTICS, columns=PROFILE_COLUMNS)
+    if args.output:
+        profile.to_csv(args.output)
+    else:
+        print(profile.to_string())
+
+
+def _recommendations(args):
+    from generate_recommendations import choose_genre_seed, genre_recommendations
+
+    _, audio_metrics = _profile(args)
+    genre_choice, market_choice = args.genre, args.market
+    if args.choose:
+        genre_choice, market_choice = choose_genre_seed()
+    recommendations = genre_recommendations(genre_choice, market_choice, audio_metrics)
+    return recommendations, genre_choice, market_choice
+
+
+def cmd_recommend(args):
+    """
+    Prints recommendations matching the profile of a stored playlist.
+
+    With --offline, the nearest tracks of the feature store are returned
+    instead of querying the recommendations endpoint.
+    """
+    if args.offline:
+        from recommender import NearestNeighbourRecommender
+        from feature_store import FeatureStore
+
+        store = FeatureStore()
+        _, audio_metrics = _profile(args)
+        recommender = NearestNeighbourRecommender.from_store(store)
+        exclude = store.playlist_ids(args.playlist)
+        print(recommender.recommend(audio_metrics, k=args.limit, exclude=exclude).to_string())
+        return
+
+    recommendations, _, _ = _recommendations(args)
+    for track in recommendations["tracks"][: args.limit]:
+        if track:
+            print(f"{track['id']}  {track['name']} - {track['artists'][0]['name']}")
+
+
+def cmd_create(args):
+    """
+    Creates a Spotify playlist from the recommendations for a stored playlist.
+    """
+    from create_playlist_from_analysis import create_playlist
+    from init_spotify_api import get_user_id
+
+    recommendations, genre_choice, market_choice = _recommendations(args)
+    user_id = args.user_id or get_user_id()
+    create_playlist(recommendations, genre_choice, market_choice, user_id)
+
+
+def cmd_moods(args):
+    """
+    Searches the mood keywords and appends the found tracks to the mood store.
+    """
+    from classify_mood import get_mood_songs, to_pd, write_moods
+
+    mood_songs = get_mood_songs(max_workers=args.workers)
+    df_dict, _ = to_pd(mood_songs)
+    write_moods(df_dict)
+
+
+def cmd_artists(args):
+    """
+    Fetches the top artists and their related artists.
+    """
+    from fetch_artists import (
+        get_related_artists,
+        order_rel_artists,
+        plot_popularity,
+        top_artists,
+    )
+
+    artists_df = top_artists()
+    print(artists_df.head())
+    print(len(artists_df))
+    if args.plot_output:
+        plot_popularity(artists_df, output=args.plot_output, formats=args.format)
+    elif args.plot:
+        plot_popularity(artists_df)
+    related_artists = get_related_artists(artists_df, max_workers=args.workers)
+    order_rel_artists(related_artists, artists_df)
+
+
+def _add_profile_arguments(parser):
+    parser.add_argument(
+        "--playlist", default=DEFAULT_PLAYLIST, help="Name of the playlist in the feature store"
+    )
+    parser.add_argument(
+        "--weights", help='Column weighting the statistics per track, e.g. "popularity"'
+    )
+
+
+def _add_seed_arguments(parser):
+    parser.add_argument("--genre", default=DEFAULT_GENRE, help="Genre seed")
+    parser.add_argument("--market", default=DEFAULT_MARKET, help="ISO 3166-1 alpha-2 market")
+    parser.add_argument(
+        "--choose", action="store_true", help="Choose the genre and market interactively"
+    )
+
+
+def _add_format_argument(parser):
+    parser.add_argument(
+        "--format", nargs="+", default=["png"], choices=["png", "svg"], help="Chart formats"
+    )
+
+
+def build_parser():
+    from batching import DEFAULT_MAX_WORKERS
+
+    parser = argparse.ArgumentParser(
+        prog="cli.py", description="Spotify Playlist Remixer"
+    )
+    parser.add_argument(
+        "--metrics",
+        help="Write the API and stage metrics to this file when the command ends "
+        "(Prometheus text format for .prom, JSON otherwise)",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    fetch = commands.add_parser("fetch", help="Fetch a playlist into the feature store")
+    fetch.add_argument("playlist", help="Predefined playlist name or Spotify playlist ID")
+    fetch.add_argument("--name", help="Name to store the playlist under")
+    fetch.add_argument("--csv", action="store_true", help="Also write <name>.csv")
+    fetch.set_defaults(func=cmd_fetch)
+
+    batch = commands.add_parser("batch", help="Fetch and profile many playlists concurrently")
+    batch.add_argument(
+        "playlists", nargs="*", help='Playlists as "name=ID", predefined names or IDs'
+    )
+    batch.add_argument("--file", help="File with one playlist per line, in the same forms")
+    batch.add_argument("--output", default="playlist_profiles.csv", help="Profile table CSV")
+    batch.add_argument(
+        "--weights", help='Column weighting the statistics per track, e.g. "popularity"'
+    )
+    batch.add_argument("--no-fetch", action="store_true", help="Profile the stored playlists")
+    batch.add_argument("--fetch-workers", type=int, default=4, help="Playlists fetched at once")
+    batch.add_argument(
+        "--profile-workers", type=int, help="Profiling processes (default: CPU count, 0: none)"
+    )
+    batch.set_defaults(func=cmd_batch)
+
+    analyze = commands.add_parser("analyze", help="Profile a stored playlist")
+    _add_profile_arguments(analyze)
+    analyze.set_defaults(func=cmd_analyze)
+
+    plot = commands.add_parser("plot", help="Render profile charts of stored playlists")
+    plot.add_argument("playlists", nargs="*", help="Playlist names (default: all stored)")
+    plot.add_argument("--output-dir", default="charts", help="Directory of the chart files")
+    plot.add_argument(
+        "--weights", help='Column weighting the statistics per track, e.g. "popularity"'
+    )
+    _add_format_argument(plot)
+    plot.add_argument(
+        "--workers", type=int, help="Rendering processes (default: CPU count, 0: none)"
+    )
+    plot.set_defaults(func=cmd_plot)
+
+    profile = commands.add_parser(
+        "profile", help="Streaming profile of every stored track or of several playlists"
+    )
+    profile.add_argument(
+        "playlists", nargs="*", help="Playlists profiled together (default: every stored track)"
+    )
+    profile.add_argument(
+        "--weights", help='Column weighting the statistics per track, e.g. "popularity"'
+    )
+    profile.add_argument("--chunk-size", type=int, help="Tracks read at once (default: 100000)")
+    profile.add_argument("--compression", type=int, help="t-digest compression (default: 200)")
+    profile.add_argument(
+        "--workers", type=int, help="Profiling processes (default: CPU count, 0: none)"
+    )
+    profile.add_argument(
+        "--merge", nargs="+", default=[], help="Saved sketches to merge into the profile"
+    )
+    profile.add_argument("--save-sketch", help="Write the merged sketch to this JSON file")
+    profile.add_argument("--output", help="Write the profile to this CSV instead of printing it")
+    profile.set_defaults(func=cmd_profile)
+
+    moods = commands.add_parser("moods", help="Refresh the mood store")
+    moods.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    moods.set_defaults(func=cmd_moods)
+
+    artists = commands.add_parser("artists", help="Top artists and related artists")
+    artists.add_argument("--workers", type=int, default=DEFAULT_MAX_WORKERS)
+    artists.add_argument("--plot", action="store_true", help="Plot the artist popularity")
+    artists.add_argument("--plot-output", help="Write the popularity plot to this file instead")
+    _add_format_argument(artists)
+    artists.set_defaults(func=cmd_artists)
+
+    recommend = commands.add_parser("recommend", help="Recommend tracks for a stored playlist")
+    _add_profile_arguments(recommend)
+    _add_seed_arguments(recommend)
+    recommend.add_argument("--limit", type=int, default=100, help="Number of tracks")
+    recommend.add_argument(
+        "--offline", action="store_true", help="Search the feature store instead of the API"
+    )
+    recommend.set_defaults(func=cmd_recommend)
+
+    create = commands.add_parser("create", help="Create a playlist from recommendations")
+    _add_profile_arguments(create)
+    _add_seed_arguments(create)
+    create.add_argument("--user-id", help="Spotify user ID (default: from PROFILE_LINK)")
+    create.set_defaults(func=cmd_create)
+    return parser
+
+
+def write_metrics(path):
+    from metrics import get_metrics
+
+    metrics = get_metrics()
+    with open(path, "w", encoding="utf-8") as file:
+        if path.endswith(".prom"):
+            file.write(metrics.to_prometheus())
+        else:
+            file.write(metrics.to_json())
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    finally:
+        if args.metrics:
+            write_metrics(args.metrics)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,275 @@
+from dotenv import load_dotenv
+import os
+from spotify_client import get, post
+import base64
+import json
+import time
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Import the Spotify user lookup
+from init_spotify_api import get_user_id
+from metrics import timed
+from response_json import decode
+
+
+# Default location of the upload checkpoints
+CHECKPOINT_PATH = "playlist_checkpoints.json"
+# Maximum number of URIs the add-items endpoint accepts per call
+ADD_TRACKS_BATCH_SIZE = 100
+
+
+class PlaylistCheckpoint:
+    """
+    Upload progress of every playlist, persisted as JSON after each step.
+
+    Each entry is keyed by "{user_id}/{playlist name}/{digest of its URIs}" and
+    records the created playlist's ID and how many URIs were uploaded, so an
+    interrupted upload continues where it stopped instead of starting over.
+    Completed uploads stay in the file, marked as done, so running the same
+    uploads again returns their playlists instead of creating new ones.
+
+    :param path: Location of the JSON file.
+    """
+
+    def __init__(self, path=CHECKPOINT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._state = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as file:
+                self._state = json.load(file)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._state.get(key)
+            return dict(entry) if entry is not None else None
+
+    def update(self, key, **values):
+        """
+        Updates an entry and writes the file atomically.
+        """
+        with self._lock:
+            self._state.setdefault(key, {}).update(values)
+            self._save()
+
+    def _save(self):
+        """
+        Writes the file atomically. Called with the lock held.
+        """
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self._state, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def uris_digest(uris):
+    """
+    Returns a short digest identifying a list of track URIs.
+    """
+    return hashlib.sha1("\n".join(uris).encode("utf-8")).hexdigest()
+
+
+def playlist_track_count(playlist_id, headers=None):
+    """
+    Returns the number of tracks a playlist currently holds on Spotify.
+
+    :param playlist_id: The Spotify ID of the playlist.
+    :param headers: Optional headers overriding the client's authorization.
+    """
+    result = get(
+        f"/playlists/{playlist_id}/tracks",
+        params={"fields": "total", "limit": 1},
+        headers=headers,
+    )
+    result.raise_for_status()
+    return decode(result)["total"]
+
+
+def find_empty_playlist(user_id, name, headers=None):
+    """
+    Looks for an empty playlist owned by the user with the given name.
+
+    Used to find a playlist whose creation was sent but never confirmed,
+    e.g. because the process stopped before the response arrived.
+
+    :param user_id: Spotify User ID of the playlist owner.
+    :param name: Name of the playlist.
+    :param headers: Optional headers overriding the client's authorization.
+    :return: The Spotify ID of the playlist, or None if there is none.
+    """
+    offset = 0
+    while True:
+        result = get(
+            f"/users/{user_id}/playlists",
+            params={"limit": 50, "offset": offset},
+            headers=headers,
+        )
+        result.raise_for_status()
+        page = decode(result)
+        for playlist in page["items"]:
+            if (
+                playlist["name"] == name
+                and playlist["owner"]["id"] == user_id
+                and playlist["tracks"]["total"] == 0
+            ):
+                return playlist["id"]
+        if not page.get("next") or not page["items"]:
+            return None
+        offset += len(page["items"])
+
+
+def write_playlist(
+    user_id, name, uris, description="", public=True, checkpoint=None, headers=None
+):
+    """
+    Creates a playlist and uploads its tracks, resuming from a checkpoint.
+
+    The playlist is created with a JSON body and the URIs are added in chunks
+    of 100. After each step the checkpoint is saved, and once all URIs are
+    uploaded the entry is marked as done, so a completed upload is returned
+    instead of repeated. When an upload is resumed, it continues from the
+    number of tracks the playlist actually holds on Spotify, and a creation
+    that was sent but never confirmed is found by name instead of repeated,
+    so calling this again after a failure neither creates a second playlist
+    nor uploads chunks twice. A different list of URIs under the same name
+    starts a new upload.
+
+    :param user_id: Spotify User ID for the playlist creator.
+    :param name: Name of the playlist; identifies the upload in the checkpoint.
+    :param uris: Spotify track URIs, e.g. "spotify:track:<id>".
+    :param description: Description of the playlist.
+    :param public: Whether the playlist is public.
+    :param checkpoint: PlaylistCheckpoint to resume from. Defaults to `CHECKPOINT_PATH`.
+    :param headers: Optional headers overriding the client's authorization. Creating
+                    playlists requires a user token, not a client credentials token.
+    :return: The Spotify ID of the playlist.
+    """
+    checkpoint = PlaylistCheckpoint() if checkpoint is None else checkpoint
+    uris = list(uris)
+    key = f"{user_id}/{name}/{uris_digest(uris)}"
+
+    state = checkpoint.get(key)
+    if state is not None and state.get("done"):
+        print(f"Already uploaded {name}: {len(uris)} tracks")
+        return state["playlist_id"]
+    playlist_id = state["playlist_id"] if state is not None else None
+    if playlist_id is not None:
+        # A chunk may have been added after the last checkpoint was saved
+        uploaded = min(playlist_track_count(playlist_id, headers=headers), len(uris))
+    else:
+        if state is not None:
+            # The creation was sent before, but its response never arrived
+            playlist_id = find_empty_playlist(user_id, name, headers=headers)
+        else:
+            checkpoint.update(key, playlist_id=None, uploaded=0)
+        if playlist_id is None:
+            create_pl = post(
+                f"/users/{user_id}/playlists",
+                json={"name": name, "description": description, "public": public},
+                headers=headers,
+            )
+            create_pl.raise_for_status()
+            playlist_id = decode(create_pl)["id"]
+        checkpoint.update(key, playlist_id=playlist_id, uploaded=0)
+        uploaded = 0
+
+    for start in range(uploaded, len(uris), ADD_TRACKS_BATCH_SIZE):
+        chunk = uris[start : start + ADD_TRACKS_BATCH_SIZE]
+        result = post(
+            f"/playlists/{playlist_id}/tracks", json={"uris": chunk}, headers=headers
+        )
+        result.raise_for_status()
+        checkpoint.update(key, uploaded=start + len(chunk))
+    checkpoint.update(key, uploaded=len(uris), done=True)
+
+    print(f"Uploaded {name}: {len(uris)} tracks")
+    return playlist_id
+
+
+@timed("playlists.write")
+def write_playlists(user_id, playlists, checkpoint=None, max_workers=4, headers=None):
+    """
+    Writes many playlists concurrently (see `write_playlist`).
+
+    Playlists that fail to upload are reported and skipped, so one failed
+    upload does not lose the IDs of the others; calling this again with the
+    same checkpoint only repeats the failed uploads.
+
+    :param user_id: Spotify User ID for the playlist creator.
+    :param playlists: List of dicts with the keys "name", "uris" and optionally
+                      "description" and "public".
+    :param checkpoint: PlaylistCheckpoint shared by all uploads.
+    :param max_workers: Maximum number of playlists uploaded at the same time.
+    :param headers: Optional headers overriding the client's authorization.
+    :return: Tuple of a dictionary mapping each uploaded playlist name to its
+             Spotify ID, and a dictionary mapping the failed playlist names to
+             their exception.
+    """
+    checkpoint = PlaylistCheckpoint() if checkpoint is None else checkpoint
+
+    def write(playlist):
+        return write_playlist(
+            user_id,
+            playlist["name"],
+            playlist["uris"],
+            description=playlist.get("description", ""),
+            public=playlist.get("public", True),
+            checkpoint=checkpoint,
+            headers=headers,
+        )
+
+    playlist_ids = {}
+    failed = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {playlist["name"]: executor.submit(write, playlist) for playlist in playlists}
+        for name, future in futures.items():
+            try:
+                playlist_ids[name] = future.result()
+            except Exception as error:
+                print(f"Failed to upload {name}: {error!r}")
+                failed[name] = error
+    return playlist_ids, failed
+
+
+# user_id = "b15f8619f0ac4d2f"
+def create_playlist(recommendations, genre_choice, market_choice, user_id, headers=None):
+    """
+    Creates a Spotify playlist from recommendations for a specific genre and market choice.
+
+    :param recommendations: Response of `genre_recommendations`.
+    :param user_id: Spotify User ID for the playlist creator.
+    :param genre_choice: The genre based on which recommendations will be generated.
+    :param market_choice: The market choice to tailor the recommendations.
+    :param headers: Optional headers overriding the client's authorization.
+    :return: The Spotify ID of the playlist.
+    """
+    import pandas as pd
+
+    # Define the playlist name and description using the genre and market choice
+    playlist_name = f"{genre_choice}-playlist-({market_choice})"
+    playlist_description = f"A {genre_choice} playlist tailored to your preferences."
+
+    tracks = [track for track in recommendations["tracks"] if track]
+    playlist_id = write_playlist(
+        user_id,
+        playlist_name,
+        [track["uri"] for track in tracks],
+        description=playlist_description,
+        headers=headers,
+    )
+
+    data = {
+        "song_name": [track["name"] for track in tracks],
+        "artist": [track["artists"][0]["name"] for track in tracks],
+        "album": [track["album"]["name"] for track in tracks],
+    }
+    new_playlist = pd.DataFrame(data)
+    print(new_playlist.head())
+    return playlist_id
+
+
+# https://open.spotify.com/user/0tv135iiir0cadoiuscx64hze?si=05da1cee6e744d7e
+# user_id = "0tv135iiir0cadoiuscx64hze"
+# user_id = "0f7eca36e4794ff3"
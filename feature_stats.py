@@ -0,0 +1,438 @@
+"""
+Vectorized descriptive statistics for audio feature matrices.
+
+All statistics of a playlist profile (count, mean, standard deviation, min,
+quartiles, max and IQR) are computed for every feature at once over a 2-D
+NumPy matrix with one row per track and one column per feature. Missing
+values (NaN) are ignored per feature. Statistics can optionally be weighted,
+e.g. by track popularity.
+
+For data that does not fit in memory, `StreamingStats` computes the same
+statistics chunk by chunk in bounded memory: count, mean and variance are
+accumulated exactly (Welford/Chan), quantiles are estimated with one t-digest
+per feature. Sketches of separate chunks or workers can be merged and
+serialized.
+"""
+
+import json
+import math
+import warnings
+
+import numpy as np
+
+# Row order of the statistics returned by `describe_features`
+STATISTICS = ["count", "mean", "std", "min", "Q1", "Median", "Q3", "max", "IQR"]
+# Quantiles behind min, Q1, Median, Q3 and max
+QUANTILES = np.array([0.0, 0.25, 0.5, 0.75, 1.0])
+# t-digest compression: the digest keeps at most about compression / 2 centroids
+DEFAULT_COMPRESSION = 200
+
+
+def clean_weights(weights):
+    """
+    Returns weights as float64 with negative and NaN weights set to 0.
+
+    The feature store uses -1 for an unknown popularity, so weighting by
+    popularity leaves those tracks out instead of subtracting them.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    return np.where(weights > 0, weights, 0.0)
+
+
+def weighted_quantiles(values, weights, quantiles=QUANTILES):
+    """
+    Computes weighted quantiles for every column of a matrix.
+
+    With equal weights the result matches the default linear interpolation of
+    `numpy.quantile` and `pandas.Series.quantile`.
+
+    Args:
+        values (ndarray): Matrix of shape (tracks, features); NaN is ignored.
+        weights (ndarray): Weights of shape (tracks,) or the shape of `values`;
+            negative and NaN weights count as 0.
+        quantiles (ndarray): Quantiles to compute, between 0 and 1.
+
+    Returns:
+        ndarray: Matrix of shape (len(quantiles), features).
+    """
+    values = np.asarray(values, dtype=np.float64)
+    weights = np.broadcast_to(clean_weights(weights).reshape(len(values), -1), values.shape)
+    weights = np.where(np.isnan(values), 0.0, weights)
+    # NaN sorts last, so each column starts with its valid values in order
+    order = np.argsort(values, axis=0)
+    sorted_values = np.take_along_axis(values, order, axis=0)
+    sorted_weights = np.take_along_axis(weights, order, axis=0)
+
+    result = np.full((len(quantiles), values.shape[1]), np.nan)
+    for column in range(values.shape[1]):
+        keep = sorted_weights[:, column] > 0
+        column_values = sorted_values[keep, column]
+        column_weights = sorted_weights[keep, column]
+        if len(column_values) == 0:
+            continue
+        cumulative = np.cumsum(column_weights)
+        span = cumulative[-1] - column_weights[-1]
+        if span <= 0:
+            result[:, column] = column_values[-1]
+            continue
+        # Position of every value on [0, 1]; equal weights give (i - 1) / (n - 1)
+        positions = (cumulative - column_weights) / span
+        result[:, column] = np.interp(quantiles, positions, column_values)
+    return result
+
+
+def describe_features(values, weights=None):
+    """
+    Computes the profile statistics of every column of a feature matrix.
+
+    Args:
+        values (ndarray): Matrix of shape (tracks, features); NaN is ignored.
+        weights (ndarray): Optional weights of shape (tracks,). Negative and
+            NaN weights count as 0, and values with weight 0 are left out of
+            every statistic, including the count. The weighted standard
+            deviation uses reliability weights, so it equals the sample
+            standard deviation when all weights are equal.
+
+    Returns:
+        ndarray: Matrix of shape (len(STATISTICS), features), rows in the
+        order of `STATISTICS`.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if values.ndim == 1:
+        values = values[:, np.newaxis]
+    valid = ~np.isnan(values)
+    if weights is not None:
+        weights = clean_weights(weights)
+        valid &= weights[:, np.newaxis] > 0
+    count = valid.sum(axis=0).astype(np.float64)
+
+    # Empty or single-value columns produce NaN statistics, as in pandas
+    with warnings.catch_warnings(), np.errstate(invalid="ignore", divide="ignore"):
+        warnings.simplefilter("ignore", RuntimeWarning)
+        if weights is None:
+            mean = np.nanmean(values, axis=0)
+            std = np.nanstd(values, axis=0, ddof=1)
+            quantiles = np.nanquantile(values, QUANTILES, axis=0)
+        else:
+            column_weights = np.where(valid, weights[:, np.newaxis], 0.0)
+            filled = np.where(valid, values, 0.0)
+            total = column_weights.sum(axis=0)
+            mean = (column_weights * filled).sum(axis=0) / total
+            squared = np.where(valid, (filled - mean) ** 2, 0.0)
+            denominator = total - (column_weights**2).sum(axis=0) / total
+            std = np.sqrt((column_weights * squared).sum(axis=0) / denominator)
+            quantiles = weighted_quantiles(values, column_weights)
+
+    # Quantile rows are min, Q1, Median, Q3 and max
+    iqr = quantiles[3] - quantiles[1]
+    return np.vstack([count, mean, std, quantiles, iqr])
+
+
+class StreamingMoments:
+    """
+    Count, mean and variance of every feature, accumulated chunk by chunk.
+
+    Each chunk is reduced with NumPy and combined with the running totals
+    using Chan's parallel update, so the result equals the in-memory mean and
+    (weighted) standard deviation of `describe_features` up to rounding.
+
+    Args:
+        features (int): Number of features (matrix columns).
+    """
+
+    __slots__ = ("count", "weight", "weight2", "mean", "m2")
+
+    def __init__(self, features):
+        # Valid values, sum of weights and of squared weights per feature
+        self.count = np.zeros(features)
+        self.weight = np.zeros(features)
+        self.weight2 = np.zeros(features)
+        self.mean = np.zeros(features)
+        # Weighted sum of squared deviations from the mean
+        self.m2 = np.zeros(features)
+
+    def update(self, values, weights=None):
+        """
+        Adds a chunk of shape (rows, features); NaN values and rows with a
+        weight that is not positive are ignored (see `clean_weights`).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        valid = ~np.isnan(values)
+        if weights is None:
+            column_weights = valid.astype(np.float64)
+        else:
+            weights = clean_weights(weights).reshape(len(values), 1)
+            valid &= weights > 0
+            column_weights = np.where(valid, weights, 0.0)
+        filled = np.where(valid, values, 0.0)
+        weight = column_weights.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(weight > 0, (column_weights * filled).sum(axis=0) / weight, 0.0)
+        m2 = (column_weights * np.where(valid, (filled - mean) ** 2, 0.0)).sum(axis=0)
+        self._combine(valid.sum(axis=0), weight, (column_weights**2).sum(axis=0), mean, m2)
+
+    def merge(self, other):
+        """
+        Adds the totals of another `StreamingMoments` over the same features.
+        """
+        self._combine(other.count, other.weight, other.weight2, other.mean, other.m2)
+        return self
+
+    def _combine(self, count, weight, weight2, mean, m2):
+        total = self.weight + weight
+        with np.errstate(invalid="ignore", divide="ignore"):
+            share = np.where(total > 0, weight / total, 0.0)
+        delta = mean - self.mean
+        self.m2 = self.m2 + m2 + delta**2 * self.weight * share
+        self.mean = self.mean + delta * share
+        self.count = self.count + count
+        self.weight = total
+        self.weight2 = self.weight2 + weight2
+
+    def std(self):
+        """
+        Returns the sample (or reliability-weighted) standard deviation per feature.
+        """
+        with np.errstate(invalid="ignore", divide="ignore"):
+            denominator = self.weight - self.weight2 / self.weight
+            return np.where(denominator > 0, np.sqrt(self.m2 / denominator), np.nan)
+
+    def to_dict(self):
+        return {name: getattr(self, name).tolist() for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data):
+        moments = cls(len(data["count"]))
+        for name in cls.__slots__:
+            setattr(moments, name, np.asarray(data[name], dtype=np.float64))
+        return moments
+
+
+class TDigest:
+    """
+    Mergeable quantile sketch of one feature (a merging t-digest).
+
+    Values are buffered and periodically merged into weighted centroids,
+    which are small near the extremes and larger around the median (the k1
+    scale function), so tail quantiles stay accurate. Min and max are exact.
+    Until more than `compression` points were added, no centroids are merged
+    and the quantiles equal those of `weighted_quantiles`.
+
+    Args:
+        compression (int): Accuracy parameter; memory grows linearly with it.
+    """
+
+    __slots__ = ("compression", "means", "weights", "min", "max", "merged", "_buffer", "_buffered")
+
+    def __init__(self, compression=DEFAULT_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.min = math.inf
+        self.max = -math.inf
+        # Whether centroids hold several points
+        self.merged = False
+        self._buffer = []
+        self._buffered = 0
+
+    @property
+    def total_weight(self):
+        self._flush()
+        return float(self.weights.sum())
+
+    def update(self, values, weights=None):
+        """
+        Adds values with optional weights; NaN values and weights that are not
+        positive are ignored.
+        """
+        values = np.asarray(values, dtype=np.float64).ravel()
+        weights = (
+            np.ones(len(values))
+            if weights is None
+            else np.broadcast_to(np.asarray(weights, dtype=np.float64), values.shape)
+        )
+        keep = ~np.isnan(values) & (weights > 0)
+        self._add(values[keep], weights[keep])
+
+    def merge(self, other):
+        """
+        Adds the centroids of another digest.
+        """
+        other._flush()
+        self.merged = self.merged or other.merged
+        self._add(other.means, other.weights)
+        # Extreme centroids may hold several points, so their means are not the extremes
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def _add(self, means, weights):
+        if len(means) == 0:
+            return
+        self.min = min(self.min, float(means.min()))
+        self.max = max(self.max, float(means.max()))
+        self._buffer.append((means, weights))
+        self._buffered += len(means)
+        if self._buffered > 10 * self.compression:
+            self._flush()
+
+    def _flush(self):
+        """
+        Merges the buffered values into the centroids.
+        """
+        if not self._buffer:
+            return
+        means = np.concatenate([self.means, *(means for means, _ in self._buffer)])
+        weights = np.concatenate([self.weights, *(weights for _, weights in self._buffer)])
+        self._buffer = []
+        self._buffered = 0
+        order = np.argsort(means, kind="stable")
+        means = means[order]
+        weights = weights[order]
+        if len(means) > self.compression:
+            # Centroids whose mid-point falls on the same unit of the scale
+            # k(q) = compression / (2 pi) * asin(2q - 1) are merged
+            cumulative = np.cumsum(weights)
+            q = (cumulative - weights / 2) / cumulative[-1]
+            k = np.floor(self.compression / (2 * np.pi) * np.arcsin(2 * q - 1))
+            starts = np.flatnonzero(np.r_[True, np.diff(k) > 0])
+            weighted = np.add.reduceat(means * weights, starts)
+            weights = np.add.reduceat(weights, starts)
+            means = weighted / weights
+            self.merged = True
+        self.means = means
+        self.weights = weights
+
+    def quantiles(self, quantiles=QUANTILES):
+        """
+        Estimates quantiles between 0 and 1; NaN while the digest is empty.
+        """
+        self._flush()
+        quantiles = np.asarray(quantiles, dtype=np.float64)
+        if len(self.means) == 0:
+            return np.full(len(quantiles), np.nan)
+        if not self.merged:
+            result = weighted_quantiles(self.means[:, np.newaxis], self.weights, quantiles)[:, 0]
+        else:
+            # Centroids sit at the middle of their weight, the ends at min and max
+            cumulative = np.cumsum(self.weights) - self.weights / 2
+            positions = np.r_[0.0, cumulative, cumulative[-1] + self.weights[-1] / 2]
+            result = np.interp(
+                quantiles,
+                positions / positions[-1],
+                np.r_[self.min, self.means, self.max],
+            )
+        result[quantiles <= 0] = self.min
+        result[quantiles >= 1] = self.max
+        return result
+
+    def to_dict(self):
+        """
+        Returns the digest as JSON-compatible values; the min and max of an
+        empty digest are written as None, since JSON has no infinity.
+        """
+        self._flush()
+        empty = self.min > self.max
+        return {
+            "compression": self.compression,
+            "means": self.means.tolist(),
+            "weights": self.weights.tolist(),
+            "min": None if empty else self.min,
+            "max": None if empty else self.max,
+            "merged": self.merged,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        digest = cls(data["compression"])
+        digest.means = np.asarray(data["means"], dtype=np.float64)
+        digest.weights = np.asarray(data["weights"], dtype=np.float64)
+        digest.min = math.inf if data["min"] is None else data["min"]
+        digest.max = -math.inf if data["max"] is None else data["max"]
+        digest.merged = data["merged"]
+        return digest
+
+
+class StreamingStats:
+    """
+    Profile statistics of a feature matrix that is fed chunk by chunk.
+
+    Memory is bounded by the number of features and the compression, not by
+    the number of rows, so profiles can be computed over a whole catalogue
+    or a continuously growing listening log. Sketches of different chunks
+    (e.g. from worker processes) are combined with `merge` and can be stored
+    with `to_json`.
+
+    Args:
+        features (int): Number of features (matrix columns).
+        compression (int): t-digest compression (see `TDigest`).
+    """
+
+    def __init__(self, features, compression=DEFAULT_COMPRESSION):
+        self.moments = StreamingMoments(features)
+        self.digests = [TDigest(compression) for _ in range(features)]
+
+    def update(self, values, weights=None):
+        """
+        Adds a chunk of shape (rows, features); NaN is ignored.
+
+        Args:
+            values (ndarray): The chunk's feature matrix.
+            weights (ndarray): Optional non-negative weights of shape (rows,).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if values.ndim == 1:
+            values = values[:, np.newaxis]
+        if weights is not None:
+            weights = np.asarray(weights, dtype=np.float64)
+        self.moments.update(values, weights)
+        for column, digest in enumerate(self.digests):
+            digest.update(values[:, column], weights)
+        return self
+
+    def merge(self, other):
+        """
+        Adds another sketch over the same features, e.g. from another worker.
+        """
+        if len(other.digests) != len(self.digests):
+            raise ValueError(
+                f"Cannot merge sketches of {len(other.digests)} and {len(self.digests)} features"
+            )
+        self.moments.merge(other.moments)
+        for digest, other_digest in zip(self.digests, other.digests):
+            digest.merge(other_digest)
+        return self
+
+    def describe(self):
+        """
+        Returns the statistics like `describe_features`.
+
+        Returns:
+            ndarray: Matrix of shape (len(STATISTICS), features), rows in the
+            order of `STATISTICS`.
+        """
+        quantiles = np.column_stack([digest.quantiles() for digest in self.digests])
+        with np.errstate(invalid="ignore"):
+            mean = np.where(self.moments.weight > 0, self.moments.mean, np.nan)
+        iqr = quantiles[3] - quantiles[1]
+        return np.vstack([self.moments.count, mean, self.moments.std(), quantiles, iqr])
+
+    def to_dict(self):
+        return {
+            "moments": self.moments.to_dict(),
+            "digests": [digest.to_dict() for digest in self.digests],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls(0)
+        stats.moments = StreamingMoments.from_dict(data["moments"])
+        stats.digests = [TDigest.from_dict(digest) for digest in data["digests"]]
+        return stats
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), allow_nan=False)
+
+    @classmethod
+    def from_json(cls, text):
+        return cls.from_dict(json.loads(text))
@@ -0,0 +1,375 @@
+"""
+Columnar store for track features shared by all playlists.
+
+Every column (track ID, name, popularity and the nine audio features) is kept
+in its own NumPy `.npy` file with a fixed dtype, so analyses can memory-map
+just the columns they need without parsing or copying anything. Tracks are
+stored once and upserted by track ID; playlists only keep the list of their
+track IDs, so overlapping playlists no longer duplicate data.
+"""
+
+import io
+import os
+
+import numpy as np
+
+from track_records import AUDIO_FEATURES
+
+# Default directory of the feature store
+STORE_PATH = "feature_store"
+
+# Fixed-width dtypes of the stored columns. The width of "name" grows with the
+# longest stored name. Spotify track IDs are 22 characters long.
+COLUMN_DTYPES = {
+    "id": np.dtype("U22"),
+    "name": np.dtype("U1"),
+    "popularity": np.dtype("int16"),
+    **{feature: np.dtype("float32") for feature in AUDIO_FEATURES},
+}
+COLUMNS = list(COLUMN_DTYPES)
+# Rows per chunk of `FeatureStore.iter_chunks`
+DEFAULT_CHUNK_SIZE = 100_000
+
+
+def playlist_columns(playlist, song_names_pop):
+    """
+    Converts the dict outputs of `multiple_audio_feat` and `get_playlist_tracks`
+    to store columns. Track arrays are converted with `track_records.track_columns`.
+
+    Parameters:
+    - playlist (dict): Mapping of track IDs to their audio features.
+    - song_names_pop (dict): Mapping of track IDs to their popularity score and name.
+
+    Returns:
+    - dict: Column name to list of values, one entry per track. Missing
+            features are NaN, missing popularity is -1.
+    """
+    ids = list(playlist.keys())
+    columns = {
+        "id": ids,
+        "name": [song_names_pop.get(id, (-1, ""))[1] for id in ids],
+        "popularity": [song_names_pop.get(id, (-1, ""))[0] for id in ids],
+    }
+    for feature in AUDIO_FEATURES:
+        columns[feature] = [playlist[id].get(feature, np.nan) for id in ids]
+    return columns
+
+
+class FeatureStore:
+    """
+    Directory of memory-mapped column files plus per-playlist track ID lists.
+
+    Args:
+        path (str): Directory of the store. Created on first write.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        self._index = None
+
+    def _column_path(self, column):
+        return os.path.join(self.path, f"{column}.npy")
+
+    def _playlist_path(self, name):
+        return os.path.join(self.path, "playlists", f"{name}.npy")
+
+    def _load_column(self, column):
+        path = self._column_path(column)
+        if not os.path.exists(path):
+            return np.empty(0, dtype=COLUMN_DTYPES[column])
+        return np.load(path, mmap_mode="r")
+
+    def _save(self, path, array):
+        """
+        Writes an array next to its destination and moves it into place, so
+        readers never see a partially written file.
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as file:
+            np.save(file, array)
+        os.replace(tmp_path, path)
+
+    def __len__(self):
+        return len(self._load_column("id"))
+
+    @property
+    def index(self):
+        """
+        Mapping of track ID to row number, built on first use.
+        """
+        if self._index is None:
+            self._index = {id: row for row, id in enumerate(self._load_column("id"))}
+        return self._index
+
+    def load(self, columns=None, playlist=None):
+        """
+        Loads columns of the store.
+
+        Without `playlist`, the arrays are read-only memory maps of the column
+        files, so no data is copied until it is accessed.
+
+        Parameters:
+        - columns (list): Names of the columns to load. Defaults to all columns.
+        - playlist (str): Restrict the rows to the tracks of this playlist, in
+          playlist order. Tracks missing from the store are skipped.
+
+        Returns:
+        - dict: Column name to NumPy array.
+        """
+        columns = COLUMNS if columns is None else list(columns)
+        data = {column: self._load_column(column) for column in columns}
+        if playlist is None:
+            return data
+        index = self.index
+        rows = np.fromiter(
+            (index[id] for id in self.playlist_ids(playlist) if id in index),
+            dtype=np.int64,
+        )
+        return {column: values[rows] for column, values in data.items()}
+
+    def iter_chunks(
+        self, columns=None, playlist=None, chunk_size=DEFAULT_CHUNK_SIZE, start=0, stop=None
+    ):
+        """
+        Yields columns of the store in chunks of rows, for analyses that do not
+        fit in memory.
+
+        Without `playlist`, each chunk is copied from the memory-mapped column
+        files, so memory stays bounded by the chunk size.
+
+        Parameters:
+        - columns (list): Names of the columns to load. Defaults to all columns.
+        - playlist (str): Restrict the rows to the tracks of this playlist (see `load`).
+        - chunk_size (int): Maximum number of rows per chunk.
+        - start, stop (int): Range of rows (or of playlist positions) to read.
+
+        Yields:
+        - dict: Column name to NumPy array, for every chunk.
+        """
+        columns = COLUMNS if columns is None else list(columns)
+        data = {column: self._load_column(column) for column in columns}
+        if playlist is None:
+            rows = None
+            size = len(self)
+        else:
+            index = self.index
+            ids = self.playlist_ids(playlist)
+            size = len(ids)
+        stop = size if stop is None else min(stop, size)
+        for chunk_start in range(start, stop, chunk_size):
+            chunk_stop = min(chunk_start + chunk_size, stop)
+            if playlist is not None:
+                rows = np.fromiter(
+                    (index[id] for id in ids[chunk_start:chunk_stop] if id in index),
+                    dtype=np.int64,
+                )
+            yield {
+                column: np.array(values[chunk_start:chunk_stop] if rows is None else values[rows])
+                for column, values in data.items()
+            }
+
+    def to_dataframe(self, columns=None, playlist=None):
+        """
+        Loads columns of the store into a pandas DataFrame (see `load`).
+        """
+        import pandas as pd
+
+        return pd.DataFrame(self.load(columns=columns, playlist=playlist))
+
+    def upsert(self, rows):
+        """
+        Inserts new tracks and updates existing tracks by track ID.
+
+        Existing tracks are updated in place through a writable memory map
+        and new tracks are appended to the end of the column files, so the
+        cost grows with the number of upserted rows, not with the store.
+        Only the name column is rewritten, when a new name is longer than
+        its fixed width.
+
+        Parameters:
+        - rows (dict or DataFrame): Column name to values. Must contain "id";
+          columns that are left out keep their stored values (or their
+          defaults for new tracks: NaN, -1 or "").
+
+        Returns:
+        - int: The number of newly inserted tracks.
+        """
+        ids = np.asarray(rows["id"], dtype=COLUMN_DTYPES["id"])
+        # The last occurrence of a duplicated ID wins
+        positions = {id: position for position, id in enumerate(ids)}
+        index = self.index
+        size = len(index)
+        new_ids = [id for id in positions if id not in index]
+        updated_ids = [id for id in positions if id in index]
+        # Input positions of the new and updated rows, and the store rows updated
+        new_source = np.fromiter((positions[id] for id in new_ids), np.int64, len(new_ids))
+        updated_source = np.fromiter(
+            (positions[id] for id in updated_ids), np.int64, len(updated_ids)
+        )
+        updated_target = np.fromiter((index[id] for id in updated_ids), np.int64, len(updated_ids))
+
+        # The ID column goes last, so the store only grows once every column
+        # holds the new rows
+        for column in [*COLUMNS[1:], "id"]:
+            if column == "id":
+                values = ids
+            elif column in rows:
+                values = np.asarray(rows[column])
+            else:
+                values = None
+
+            if values is not None and column != "id" and len(updated_ids):
+                self._update_rows(column, updated_target, values[updated_source])
+            if new_ids:
+                if values is None:
+                    new_values = np.full(len(new_ids), _default_value(column))
+                else:
+                    new_values = values[new_source]
+                self._append_rows(column, size, new_values)
+
+        for offset, id in enumerate(new_ids):
+            index[id] = size + offset
+        return len(new_ids)
+
+    def _writable(self, column, values):
+        """
+        Converts values to the stored dtype of a column. Names longer than the
+        stored width first widen the name column, which rewrites its file.
+        """
+        if column != "name":
+            return np.asarray(values).astype(COLUMN_DTYPES[column])
+        values = np.asarray(values, dtype=str)
+        stored = self._load_column(column)
+        width = max(stored.dtype.itemsize // 4, 1)
+        if values.dtype.itemsize // 4 > width:
+            width = values.dtype.itemsize // 4
+            if len(stored):
+                widened = stored.astype(f"U{width}")
+                # Release the memory map before its file is replaced
+                del stored
+                self._save(self._column_path(column), widened)
+        return values.astype(f"U{width}")
+
+    def _update_rows(self, column, rows, values):
+        """
+        Overwrites rows of a column file in place.
+        """
+        values = self._writable(column, values)
+        stored = np.load(self._column_path(column), mmap_mode="r+")
+        stored[rows] = values
+        stored.flush()
+        del stored
+
+    def _append_rows(self, column, size, values):
+        """
+        Writes values after the first `size` rows of a column file.
+
+        The rows are written first and the row count in the `.npy` header is
+        updated afterwards, so readers never see rows that are not written
+        yet. Rows beyond `size` left behind by an interrupted upsert are
+        overwritten.
+        """
+        values = self._writable(column, values)
+        path = self._column_path(column)
+        if not os.path.exists(path):
+            self._save(path, values)
+            return
+
+        with open(path, "r+b") as file:
+            version = np.lib.format.read_magic(file)
+            read_header = (
+                np.lib.format.read_array_header_1_0
+                if version == (1, 0)
+                else np.lib.format.read_array_header_2_0
+            )
+            shape, _, dtype = read_header(file)
+            offset = file.tell()
+            if shape[0] < size:
+                raise ValueError(f"Column {column} has {shape[0]} rows, expected {size}")
+            header = _npy_header(dtype, size + len(values), version)
+            if len(header) == offset:
+                file.seek(offset + size * dtype.itemsize)
+                file.write(values.tobytes())
+                file.truncate()
+                file.flush()
+                file.seek(0)
+                file.write(header)
+                return
+
+        # The header has no room for the new row count
+        stored = self._load_column(column)
+        appended = np.concatenate([stored[:size], values])
+        del stored
+        self._save(path, appended)
+
+    def append(self, rows):
+        """
+        Adds tracks that are not in the store yet.
+
+        Raises:
+        - ValueError: If one of the track IDs is already stored.
+        """
+        ids = np.asarray(rows["id"], dtype=COLUMN_DTYPES["id"])
+        existing = [str(id) for id in ids if id in self.index]
+        if existing:
+            raise ValueError(f"Tracks already stored: {existing[:5]}")
+        return self.upsert(rows)
+
+    def add_playlist(self, name, track_ids):
+        """
+        Saves the track IDs of a playlist, replacing any previous version.
+        """
+        ids = np.asarray(list(track_ids), dtype=COLUMN_DTYPES["id"])
+        self._save(self._playlist_path(name), ids)
+
+    def playlist_ids(self, name):
+        """
+        Returns the track IDs of a stored playlist.
+
+        Raises:
+        - KeyError: If no playlist with this name is stored.
+        """
+        path = self._playlist_path(name)
+        if not os.path.exists(path):
+            raise KeyError(name)
+        return np.load(path, mmap_mode="r")
+
+    def playlists(self):
+        """
+        Returns the names of all stored playlists.
+        """
+        directory = os.path.join(self.path, "playlists")
+        if not os.path.isdir(directory):
+            return []
+        return sorted(
+            file[: -len(".npy")] for file in os.listdir(directory) if file.endswith(".npy")
+        )
+
+
+def _npy_header(dtype, length, version):
+    """
+    Returns the `.npy` header of a 1-D array.
+    """
+    buffer = io.BytesIO()
+    header = {
+        "descr": np.lib.format.dtype_to_descr(dtype),
+        "fortran_order": False,
+        "shape": (length,),
+    }
+    if version == (1, 0):
+        np.lib.format.write_array_header_1_0(buffer, header)
+    else:
+        np.lib.format.write_array_header_2_0(buffer, header)
+    return buffer.getvalue()
+
+
+def _default_value(column):
+    """
+    Value of a column for tracks inserted without it.
+    """
+    if column in ("id", "name"):
+        return ""
+    if column == "popularity":
+        return -1
+    return np.nan
@@ -1,28 +1,31 @@
 from dotenv import load_dotenv
 import os
-from requests import post, get
+from spotify_client import get, post
 import base64
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
+from concurrent.futures import ThreadPoolExecutor
 
-# Import functions for Spotify API authentication
-from init_spotify_api import token, headers
+from artist_graph import fetch_related_artists
+from batching import DEFAULT_MAX_WORKERS
+from metrics import timed
+from response_json import decode
 
 
-def top_artists(token=token, headers=headers):
+def top_artists(token=None, headers=None):
     """
     Fetches top reggaeton artists from the Spotify API and returns their details.
 
-    :param token: Spotify API token for authorization.
-    :param headers: Request headers including the authorization token.
+    :param token: Unused, the shared client manages the token.
+    :param headers: Optional headers overriding the client's authorization.
     :return: A DataFrame with artist details including name, Spotify ID, popularity, and genres.
     """
-    url = "https://api.spotify.com/v1/search"
+    import pandas as pd
+
+    url = "/search"
     query = "?q=genre=reggeaton&type=artist&limit=30&market=NL"
     query_url = url + query
     result = get(query_url, headers=headers)
-    json_result = json.loads(result.content)["artists"]["items"]
+    json_result = decode(result)["artists"]["items"]
     artists_data = []
     for artist in json_result:
         artists_data.append(
@@ -37,74 +40,81 @@ def top_artists(token=token, headers=headers):
     return artists_data
 
 
-artists_df = top_artists()
-print(artists_df.head())
-print(len(artists_df))
-
-
-def plot_popularity(artists_data=artists_df):
+def plot_popularity(artists_data, output=None, formats=("png",)):
     """
     Plots a scatter graph of artist popularity scores based on their ranking.
 
     :param artists_data: DataFrame containing artists and their popularity scores.
+    :param output: Path of the chart file. When given, the chart is rendered headless
+                   and written once per format instead of being shown in a window.
+    :param formats: Formats of the written chart, "png" and/or "svg".
+    :return: The paths of the written files, or None when the chart is shown.
     """
-    plt.scatter(artists_data.index, artists_data["Popularity"], color="g")
-    plt.xlabel("Position in the ranking")
-    plt.ylabel("Popularity Score")
-    plt.show()
+    from charts import draw_popularity, popularity_figure, save_figure
+
+    if output is not None:
+        return save_figure(popularity_figure(artists_data), output, formats)
 
+    import matplotlib.pyplot as plt
 
-plot_popularity()
+    draw_popularity(plt.figure().add_subplot(), artists_data)
+    plt.show()
 
 
 # Retrieves related artists for each artist in the provided DataFrame using Spotify API.
-# Returns: DataFrame with names of related artists.
-def get_related_artists(artist_data=artists_df):
+# Returns: DataFrame with one row per (seed artist, related artist) pair.
+@timed("artists.related")
+def get_related_artists(artist_data, max_workers=DEFAULT_MAX_WORKERS):
     """
     Fetches related artists for each artist in the provided DataFrame.
 
+    The seed artists are requested concurrently. Every row carries the ID of
+    its seed artist, so rows stay attributed correctly however many related
+    artists Spotify returns per seed.
+
     :param artist_data: DataFrame with artist Spotify IDs.
-    :return: A DataFrame with names of related artists for each main artist.
+    :param max_workers: Maximum number of requests in flight at the same time.
+    :return: A DataFrame with the columns "Seed ID", "Spotify ID" and "Artist Name".
     """
-    rel_artist = []
-    # loop through ID's to get related artist url for each
-    for id in artist_data["Spotify ID"]:
-        url = f"https://api.spotify.com/v1/artists/{id}/related-artists"
-        result = get(url, headers=headers)
-        json_result = json.loads(result.content)["artists"]
-
-        # 20 related artists per artists -> 600 (599)
-
-        for rel in json_result:
-            rel_artist.append(
-                {
-                    "Artist Name": rel["name"],
-                }
-            )
+    import pandas as pd
+
+    seed_ids = list(artist_data["Spotify ID"])
+    rel_artist = {"Seed ID": [], "Spotify ID": [], "Artist Name": []}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for seed_id, related in zip(
+            seed_ids, executor.map(fetch_related_artists, seed_ids)
+        ):
+            for rel_id, rel_name in related:
+                rel_artist["Seed ID"].append(seed_id)
+                rel_artist["Spotify ID"].append(rel_id)
+                rel_artist["Artist Name"].append(rel_name)
     rel_artist = pd.DataFrame(rel_artist)
     print(rel_artist.head())
     return rel_artist
 
 
-related_artists = get_related_artists()
-
-
-def order_rel_artists(related_artists=related_artists, artist_data=artists_df):
+def order_rel_artists(related_artists, artist_data, as_lists=False):
     """
     Associates related artists with the main artists in the original DataFrame.
 
-    :param related_artists: DataFrame with names of related artists.
+    The related artist names are grouped by seed ID in a single operation and
+    mapped onto the main artists; artists without related artists get an
+    empty value. Related artists without a name are left out.
+
+    :param related_artists: DataFrame from `get_related_artists`.
     :param artist_data: Original DataFrame of main artists.
+    :param as_lists: Store the names as lists instead of a comma-separated string.
+    :return: The main artists DataFrame with a "Related Artists" column.
     """
-    artist_data["Related Artists"] = ""
-    print(artist_data["Artist Name"][0])
-    for idx, rel in enumerate(related_artists["Artist Name"]):
-        connector = idx // 20
-        if artist_data.loc[connector, "Related Artists"]:
-            artist_data.loc[connector, "Related Artists"] += ", "
-        artist_data.loc[connector, "Related Artists"] += rel
+    related_artists = related_artists.dropna(subset=["Artist Name"])
+    names = related_artists.groupby("Seed ID", sort=False)["Artist Name"]
+    grouped = names.agg(list) if as_lists else names.agg(", ".join)
+    related = artist_data["Spotify ID"].map(grouped)
+    if as_lists:
+        related = related.apply(lambda value: value if isinstance(value, list) else [])
+    else:
+        related = related.fillna("")
+    artist_data["Related Artists"] = related
 
     print(artist_data.head())
-
-
-order_rel_artists()
+    return artist_data
@@ -1,24 +1,88 @@
-from init_spotify_api import headers, token
-from search_tracks import multiple_audio_feat
-from requests import post, get
-import json
-import pandas as pd
+from search_tracks import audio_features_array
+from feature_store import FeatureStore
+from spotify_client import get, post
+from metrics import timed
+from response_json import PlaylistPage, decode
+from track_records import AUDIO_FEATURES, track_columns
 import csv
 
+import numpy as np
+
 # Predefined Spotify playlist IDs for different genres
 afrobeats = "4JJgffqENbOlwaeOcUzNbt"
 portugues = "6r22I00vHMCxhneAGtiPNT"
 drum_and_bass = "3djIt439HKrISGRydpmNWn"
 
+# Predefined playlists by name, as accepted by `cli.py fetch`
+PLAYLISTS = {
+    "afrobeats": afrobeats,
+    "portugues": portugues,
+    "drum_and_bass": drum_and_bass,
+}
+
+
+# Only the fields used downstream are requested, which keeps the pages small
+PLAYLIST_TRACK_FIELDS = "next,items(track(id,name,popularity))"
+# Maximum number of items the playlist tracks endpoint returns per page
+PLAYLIST_PAGE_SIZE = 100
+
+
+def iter_playlist_tracks(id_p, market="BE", fields=PLAYLIST_TRACK_FIELDS):
+    """
+    Lazily fetches the tracks of a Spotify playlist, following pagination.
+
+    Pages are requested one after another and their tracks are yielded as soon
+    as each page arrives, so callers can start processing before the whole
+    playlist has been downloaded. Local files and removed tracks (without ID)
+    are skipped.
+
+    Parameters:
+    - id_p (str): The Spotify ID for the playlist.
+    - market (str): ISO 3166-1 alpha-2 country code used for track relinking.
+    - fields (str): Field filter passed to the API. Must include "next".
+
+    Yields:
+    - Track: The track of each playlist item (see `response_json.Track`).
+    """
+    url = f"/playlists/{id_p}/tracks"
+    offset = 0
+    while True:
+        params = {
+            "market": market,
+            "fields": fields,
+            "limit": PLAYLIST_PAGE_SIZE,
+            "offset": offset,
+        }
+        result = get(url, params=params)
+        result.raise_for_status()
+        page = decode(result, PlaylistPage)
+        items = page.items
+        for item in items:
+            track = item.track
+            if track and track.id:
+                yield track
+        # The last page has no link to a next page
+        if not page.next or not items:
+            break
+        offset += len(items)
+
+
+def _popularity_name(track):
+    """
+    Returns [popularity, name] of a track, with -1 and "" for null values.
+    """
+    popularity = track.popularity if track.popularity is not None else -1
+    return [popularity, track.name or ""]
+
 
 # GET TRACKS FROM GIVEN PLAYLIST_ID
 def get_playlist_tracks(id_p):
     """
     Fetches the tracks of a Spotify playlist and extracts their ID, popularity, and name.
 
-    This function queries the Spotify Web API for the tracks in a specified playlist.
-    For each track, it extracts the track's ID, popularity score, and name, storing
-    these in a dictionary keyed by the track ID.
+    This function queries the Spotify Web API for all pages of tracks in a specified
+    playlist. For each track, it extracts the track's ID, popularity score, and name,
+    storing these in a dictionary keyed by the track ID.
 
     Parameters:
     - playlist_id (str): The Spotify ID for the playlist.
@@ -28,76 +92,92 @@ def get_playlist_tracks(id_p):
             the track's popularity score and name, in that order.
     """
     song_id_pop = {}
-    url = f"https://api.spotify.com/v1/playlists/{id_p}/tracks?market=BE"
-    result = get(url, headers=headers)
-    result = json.loads(result.content)["items"]
-    for i in range(len(result)):
-        song_id_pop[result[i]["track"]["id"]] = [
-            result[i]["track"]["popularity"],
-            result[i]["track"]["name"],
-        ]
-    print(song_id_pop)
+    for track in iter_playlist_tracks(id_p):
+        song_id_pop[track.id] = _popularity_name(track)
+    print(f"Fetched {len(song_id_pop)} tracks")
     return song_id_pop
 
 
-playlist_tracks = get_playlist_tracks(drum_and_bass)
-# ____________________________
+@timed("playlist.fetch_features")
+def fetch_playlist_features(id_p):
+    """
+    Fetches the tracks of a playlist together with their audio features.
+
+    Track IDs are streamed from the paginated playlist fetch straight into the
+    batched audio feature requests, so features for the first pages are being
+    downloaded while later pages are still arriving.
 
+    Parameters:
+    - id_p (str): The Spotify ID for the playlist.
 
-# FUNCTION CALL FROM SEARCH FILE
-playlist_info = multiple_audio_feat(token=token, headers=headers, ids=playlist_tracks)
-# ____________________________
+    Returns:
+    - numpy.ndarray: Structured array with the ID, name, popularity and audio
+      features of every track, in playlist order (see `track_records`).
+    """
+    song_id_pop = {}
 
+    def track_ids():
+        for track in iter_playlist_tracks(id_p):
+            song_id_pop[track.id] = _popularity_name(track)
+            yield track.id
 
-def playlist_to_csv(playlist, song_names_pop, playlist_name):
+    tracks = audio_features_array(track_ids(), song_names_pop=song_id_pop)
+    print(f"Fetched {len(tracks)} tracks")
+    return tracks
+
+
+@timed("playlist.to_csv")
+def playlist_to_csv(tracks, playlist_name):
     """
     Generates a CSV file from playlist tracks's data,
-    enriched with song names and popularity scores.
+    including song names and popularity scores.
 
     Parameters:
-    - playlist (dict): Mapping of track IDs to their features.
-    - song_names_pop (dict): Mapping of track IDs to their popularity score and name.
+    - tracks (numpy.ndarray): Track array from `fetch_playlist_features`.
     - playlist_name (str): Base name for the output CSV file.
 
-    Updates the playlist dictionary with song names and popularity from song_names_pop,
-    then writes the complete track information to a CSV named `playlist_name.csv`,
+    Writes the complete track information to a CSV named `playlist_name.csv`,
     with predefined columns for track features including name, ID, and popularity.
+    Missing features are written as empty values.
     """
-    print(playlist)
-    head = [
-        "name",
-        "id",
-        "popularity",
-        "danceability",
-        "energy",
-        "loudness",
-        "speechiness",
-        "acousticness",
-        "instrumentalness",
-        "liveness",
-        "valence",
-        "tempo",
-    ]
-
-    for track_id, track_info in song_names_pop.items():
-        popularity, song_name = track_info
-        if track_id in playlist:
-            playlist[track_id]["name"] = song_name
-            playlist[track_id]["popularity"] = popularity
-    # Determine the CSV header based on the keys of the first item in playlist (assuming all items have the same keys)
+    head = ["name", "id", "popularity", *AUDIO_FEATURES]
+    columns = track_columns(tracks)
     with open(
         str(playlist_name + ".csv"), mode="w", newline="", encoding="utf-8"
     ) as file:
-        writer = csv.DictWriter(file, fieldnames=head)
-        writer.writeheader()
+        writer = csv.writer(file)
+        writer.writerow(head)
 
-        # Write each track's features, ensuring they follow the order in 'head'
-        for track_id, features in playlist.items():
-            # Create a row dictionary starting with the track ID, then update it with the rest of the features
-            row = {"id": track_id}
-            row.update(features)
-            writer.writerow(row)
+        # Features stay float32 scalars, which print with their shortest representation
+        features = [
+            ["" if np.isnan(value) else value for value in columns[feature]]
+            for feature in AUDIO_FEATURES
+        ]
+        writer.writerows(
+            zip(
+                columns["name"].tolist(),
+                columns["id"].tolist(),
+                columns["popularity"].tolist(),
+                *features,
+            )
+        )
+
+
+@timed("playlist.to_store")
+def playlist_to_store(tracks, playlist_name, store=None):
+    """
+    Saves a playlist's tracks to the shared feature store.
 
+    Tracks are upserted by ID, so tracks that appear in several playlists are
+    stored once; the playlist itself is saved as its list of track IDs.
 
-playlist_to_csv(playlist_info, playlist_tracks, "drum_and_bass")
-# ____________________________
+    Parameters:
+    - tracks (numpy.ndarray): Track array from `fetch_playlist_features`.
+    - playlist_name (str): Name under which the playlist is saved.
+    - store (FeatureStore): The store to write to. Defaults to the store in `STORE_PATH`.
+    """
+    store = FeatureStore() if store is None else store
+    columns = track_columns(tracks)
+    new_tracks = store.upsert(columns)
+    store.add_playlist(playlist_name, columns["id"])
+    print(f"Stored {playlist_name}: {len(tracks)} tracks, {new_tracks} new")
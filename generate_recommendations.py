@@ -1,16 +1,23 @@
 from dotenv import load_dotenv
 import os
-from requests import post, get
+from spotify_client import get, post
 import base64
 import json
-import pandas as pd
-import matplotlib.pyplot as plt
 import time
 
-# Import required modules and variables from other scripts for
-# Spotify API access and track searching
-from init_spotify_api import token, headers
-from search_tracks import single_song_info, multiple_song_info
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from batching import DEFAULT_MAX_WORKERS
+from feature_store import FeatureStore
+from metrics import timed
+from response_json import decode
+
+# Import track search helpers from the search script
+from search_tracks import single_song_info, multiple_song_info, audio_features_array
+from track_records import track_columns
+
+# Number of new tracks whose features are fetched and stored at once by a sweep
+SWEEP_BATCH_SIZE = 1000
 
 
 def choose_genre_seed():
@@ -25,9 +32,9 @@ def choose_genre_seed():
     """
 
     # Fetch available genre seeds from Spotify
-    seeds_url = "https://api.spotify.com/v1/recommendations/available-genre-seeds"
-    genre_result = get(url=seeds_url, headers=headers)
-    genre_seeds = json.loads(genre_result.content)
+    seeds_url = "/recommendations/available-genre-seeds"
+    genre_result = get(url=seeds_url)
+    genre_seeds = decode(genre_result)
     print(genre_seeds["genres"])
 
     # Prompt the user to choose a genre from the fetched list
@@ -36,9 +43,9 @@ def choose_genre_seed():
         genre_choice = input("Choose a genre: ")
 
     # Fetch available markets from Spotify
-    seeds_url = "https://api.spotify.com/v1/markets"
-    market_result = get(url=seeds_url, headers=headers)
-    markets = json.loads(market_result.content)
+    seeds_url = "/markets"
+    market_result = get(url=seeds_url)
+    markets = decode(market_result)
     print(markets["markets"])
 
     # Prompt the user to choose a market from the fetched list
@@ -58,21 +65,18 @@ market_choice = "BR"
 # print(genre_choice, market_choice)
 
 
-def genre_recommendations(genre_choice, market_choice, audio_metrics):
+def build_recommendation_params(audio_metrics):
     """
-    Generates music recommendations based on a specified genre, market, and set of audio metrics.
+    Builds the audio feature parameters of a recommendation request from a playlist profile.
 
     Parameters:
-        genre_choice (str): The chosen genre for recommendation.
-        market_choice (str): The chosen market (country) for the recommendation.
         audio_metrics (DataFrame): A DataFrame containing audio metrics which will inform the recommendation.
 
     Returns:
-        dict: A dictionary containing the recommended tracks and their details.
+        str: The min_/max_/target_ query parameters, joined with '&'.
     """
     # Transpose the audio metrics DataFrame to access features easily
     audio_metrics = audio_metrics.T
-    print(genre_choice, market_choice)
 
     # Initialize a dictionary to store the recommendation parameters
     params = {}
@@ -190,8 +194,6 @@ def genre_recommendations(genre_choice, market_choice, audio_metrics):
         "target_valence",
     ]
 
-    # Construct the URL string
-    base_url = f"https://api.spotify.com/v1/recommendations?limit=100&market={str(market_choice)}&seed_genres={str(genre_choice)}"
     # Initialize an empty list to hold the formatted parameter strings
     formatted_params = []
 
@@ -252,19 +254,159 @@ def genre_recommendations(genre_choice, market_choice, audio_metrics):
             formatted_params.append(f"{key}={value}")
 
     # Join the formatted parameter strings with '&' to create the URL parameters string
-    url_params = "&".join(formatted_params)
+    return "&".join(formatted_params)
+
+
+def request_recommendations(genre_choice, market_choice, url_params):
+    """
+    Requests up to 100 recommendations for a genre and market.
+
+    Parameters:
+        genre_choice (str): The chosen genre for recommendation.
+        market_choice (str): The chosen market (country) for the recommendation.
+        url_params (str): Audio feature parameters from `build_recommendation_params`.
 
-    # Construct the final URL
+    Returns:
+        dict: A dictionary containing the recommended tracks and their details.
+    """
+    # Construct the URL string
+    base_url = f"/recommendations?limit=100&market={str(market_choice)}&seed_genres={str(genre_choice)}"
     url_rec = f"{base_url}&{url_params}"
 
     # Send the request and parse the response
-    recommendation_result = get(url=url_rec, headers=headers)
-    recommendation = json.loads(recommendation_result.content)
+    recommendation_result = get(url=url_rec)
+    recommendation_result.raise_for_status()
+    return decode(recommendation_result)
+
+
+@timed("recommendations.genre")
+def genre_recommendations(genre_choice, market_choice, audio_metrics):
+    """
+    Generates music recommendations based on a specified genre, market, and set of audio metrics.
+
+    Parameters:
+        genre_choice (str): The chosen genre for recommendation.
+        market_choice (str): The chosen market (country) for the recommendation.
+        audio_metrics (DataFrame): A DataFrame containing audio metrics which will inform the recommendation.
+
+    Returns:
+        dict: A dictionary containing the recommended tracks and their details.
+    """
+    print(genre_choice, market_choice)
+    url_params = build_recommendation_params(audio_metrics)
+    recommendation = request_recommendations(genre_choice, market_choice, url_params)
     print(recommendation)
     print(len(recommendation["tracks"]))
     return recommendation
 
 
+def sweep_recommendations(
+    genres,
+    markets,
+    profiles,
+    store=None,
+    max_workers=DEFAULT_MAX_WORKERS,
+    batch_size=SWEEP_BATCH_SIZE,
+    failed=None,
+):
+    """
+    Requests recommendations for every genre x market x profile combination.
+
+    The parameters of each profile are built once. The requests run
+    concurrently, and only tracks that are neither in the feature store nor
+    seen earlier in the sweep are new: their audio features are fetched in
+    batches (through the shared response cache) and they are upserted into
+    the store once `batch_size` of them are pending, and when the sweep ends.
+    Each combination is also saved as a playlist named
+    "recommendations-{profile}-{genre}-{market}".
+
+    A combination whose request fails (e.g. an unsupported genre and market
+    pair) is reported and skipped, so it does not stop the sweep.
+
+    Parameters:
+        genres (list): Genre seeds, e.g. from the available genre seeds.
+        markets (list): ISO 3166-1 alpha-2 country codes.
+        profiles (dict): Profile name to audio metrics DataFrame (see `audio_values_range`).
+        store (FeatureStore): The store to write to. Defaults to the store in `STORE_PATH`.
+        max_workers (int): Maximum number of recommendation requests in flight.
+        batch_size (int): Number of new tracks fetched and upserted at once.
+        failed (dict): Optional dict that receives the exception of every
+            failed combination, keyed by (profile name, genre, market).
+
+    Yields:
+        tuple: (profile name, genre, market, list of recommended track IDs,
+               number of tracks that were new to the store), in completion order.
+    """
+    store = FeatureStore() if store is None else store
+    failed = {} if failed is None else failed
+    profile_params = {
+        name: build_recommendation_params(audio_metrics)
+        for name, audio_metrics in profiles.items()
+    }
+    combinations = [
+        (name, genre, market)
+        for name in profile_params
+        for genre in genres
+        for market in markets
+    ]
+    # Track ID to row of the stored tracks; kept up to date by `upsert`
+    stored = store.index
+    # Popularity and name of the new tracks not stored yet
+    pending = {}
+
+    def store_pending():
+        if pending:
+            tracks = audio_features_array(list(pending), song_names_pop=pending)
+            store.upsert(track_columns(tracks))
+            pending.clear()
+
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {
+            executor.submit(
+                request_recommendations, genre, market, profile_params[name]
+            ): (name, genre, market)
+            for name, genre, market in combinations
+        }
+        for future in as_completed(futures):
+            name, genre, market = futures[future]
+            try:
+                recommendation = future.result()
+            except Exception as error:
+                print(f"Failed to get recommendations for {name}/{genre}/{market}: {error}")
+                failed[name, genre, market] = error
+                continue
+            tracks = [track for track in recommendation["tracks"] if track]
+            track_ids = [track["id"] for track in tracks]
+
+            new_tracks = 0
+            for track in tracks:
+                if track["id"] not in stored and track["id"] not in pending:
+                    # Null popularity and names are stored as -1 and ""
+                    popularity = track.get("popularity")
+                    pending[track["id"]] = [
+                        popularity if popularity is not None else -1,
+                        track.get("name") or "",
+                    ]
+                    new_tracks += 1
+            if len(pending) >= batch_size:
+                store_pending()
+            store.add_playlist(f"recommendations-{name}-{genre}-{market}", track_ids)
+            yield name, genre, market, track_ids, new_tracks
+    except BaseException:
+        # Also runs when the caller stops iterating early: requests that have
+        # not started are dropped, and a failing flush does not hide the
+        # original exception
+        executor.shutdown(cancel_futures=True)
+        try:
+            store_pending()
+        except Exception as error:
+            print(f"Failed to store {len(pending)} new tracks: {error!r}")
+        raise
+    executor.shutdown()
+    store_pending()
+
+
 # TO DO
 # Find way to search for songs with keywords
 # Code in advance the create playlist feature
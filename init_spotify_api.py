@@ -1,11 +1,16 @@
 from dotenv import load_dotenv
 import os
-from requests import post, get
+from spotify_client import get, post, get_client
+from response_json import decode
 import base64
-import json
+import threading
+import time
 
+# Seconds before the reported expiry at which a token is refreshed
+TOKEN_REFRESH_MARGIN = 60
 
-def get_token():
+
+def request_token():
     """
     Retrieves an access token from Spotify Web API using the client credentials flow.
 
@@ -14,7 +19,8 @@ def get_token():
     token from Spotify's token endpoint.
 
     Returns:
-        str: An access token for the Spotify Web API.
+        dict: The token response, containing "access_token", "token_type"
+        and "expires_in" (lifetime in seconds).
     """
     # Load environment variables
     load_dotenv()
@@ -27,7 +33,7 @@ def get_token():
     auth_base64 = str(base64.b64encode(auth_bytes), "utf-8")
 
     # Spotify URL for requesting an access token
-    url = "https://accounts.spotify.com/api/token"
+    url = get_client().token_url
 
     # Headers including the encoded client credentials
     headers = {
@@ -37,25 +43,94 @@ def get_token():
     # Data payload specifying the grant type
     data = {"grant_type": "client_credentials"}
     # POST request to get the token
-    result = post(url, headers=headers, data=data)
-    json_result = json.loads(result.content)
-    # Extract the access token from response
-    token = json_result["access_token"]
-    print(json_result["token_type"])
-    print(token)
-    return token
+    result = post(url, headers=headers, data=data, auth=False)
+    result.raise_for_status()
+    return decode(result)
+
+
+class TokenManager:
+    """
+    Caches the access token and refreshes it shortly before it expires.
+
+    The token is only requested on first use. All methods are safe to call
+    from multiple threads; concurrent callers share a single refresh.
+
+    Args:
+        fetch (callable): Returns a token response dict like `request_token`.
+        refresh_margin (float): Seconds before expiry at which to refresh.
+    """
+
+    def __init__(self, fetch=request_token, refresh_margin=TOKEN_REFRESH_MARGIN):
+        self.fetch = fetch
+        self.refresh_margin = refresh_margin
+        self._token = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+
+    def _is_valid(self):
+        return self._token is not None and time.monotonic() < self._expires_at
+
+    def get_token(self):
+        """
+        Returns a valid access token, requesting a new one if needed.
+
+        Returns:
+            str: An access token for the Spotify Web API.
+        """
+        if self._is_valid():
+            return self._token
+        with self._lock:
+            # Another thread may have refreshed the token while we waited
+            if not self._is_valid():
+                json_result = self.fetch()
+                expires_in = float(json_result.get("expires_in", 3600))
+                # Short-lived tokens are refreshed halfway through their lifetime
+                margin = min(self.refresh_margin, expires_in / 2)
+                self._token = json_result["access_token"]
+                self._expires_at = time.monotonic() + expires_in - margin
+            return self._token
+
+    def invalidate(self, token=None):
+        """
+        Discards the cached token, e.g. after the API answered with 401.
+
+        Args:
+            token (str): Only invalidate if this is still the cached token, so
+                that a token already refreshed by another thread is kept.
+        """
+        with self._lock:
+            if token is None or token == self._token:
+                self._token = None
+                self._expires_at = 0.0
+
+
+# Token manager shared by every module of the project
+token_manager = TokenManager()
 
 
-def get_auth_headers(token):
+def get_token():
+    """
+    Returns the cached access token, fetching or refreshing it when needed.
+
+    Returns:
+        str: An access token for the Spotify Web API.
+    """
+    return token_manager.get_token()
+
+
+def get_auth_headers(token=None):
     """
     Creates the authorization headers needed for subsequent requests to the Spotify API.
 
     Args:
-        token (str): The access token for Spotify Web API.
+        token (str): The access token for Spotify Web API. Defaults to the
+            token of the shared token manager.
 
     Returns:
         dict: Headers containing the authorization field.
     """
+    if token is None:
+        token = get_token()
     return {"Authorization": "Bearer " + token}
 
 
@@ -76,9 +151,15 @@ def get_user_id():
     return user_id
 
 
-# Main script flow: Get the token, setup headers for authentication, and retrieve the user ID.
-token = get_token()
-headers = get_auth_headers(token=token)
-user_id = get_user_id()
-
-print(headers)
+def __getattr__(name):
+    """
+    Resolves the legacy `token`, `headers` and `user_id` module attributes
+    on access instead of at import time.
+    """
+    if name == "token":
+        return get_token()
+    if name == "headers":
+        return get_auth_headers()
+    if name == "user_id":
+        return get_user_id()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
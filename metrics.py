@@ -0,0 +1,359 @@
+"""
+Instrumentation of the Spotify API calls and of the pipeline stages.
+
+`SpotifyClient` reports every HTTP attempt to a `Metrics` registry: the
+request count and latency histogram per endpoint and status, response bytes,
+retries by reason (429s, server errors, connection errors, expired tokens),
+time spent waiting for the rate limiter, and cache hits and misses. Pipeline
+functions are timed as named stages with `stage` or `timed`.
+
+A snapshot can be exported as JSON or in the Prometheus text exposition
+format, and sinks registered with `Metrics.add_sink` receive every event as
+it is recorded, e.g. to forward it to a log or a StatsD agent.
+"""
+
+import bisect
+import functools
+import json
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds in seconds of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Reasons for which the client retries a request
+RETRY_REASONS = ("throttled", "server_error", "connection_error", "unauthorized")
+
+
+class Histogram:
+    """
+    Cumulative histogram with fixed bucket bounds, as used by Prometheus.
+
+    Args:
+        buckets (tuple): Sorted upper bounds of the buckets. Values above the
+            last bound are only counted in the implicit +Inf bucket.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        Estimates a quantile as the upper bound of the bucket that contains it.
+        """
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + (math.inf,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(self.buckets + ("+Inf",), self.cumulative())
+            },
+        }
+
+    def cumulative(self):
+        """
+        Returns the number of observations at or below every bound, including +Inf.
+        """
+        total = 0
+        cumulative = []
+        for count in self.counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+
+class EndpointMetrics:
+    """
+    Counters and latency histogram of one API endpoint.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.requests = {}
+        self.latency = Histogram(buckets)
+        self.response_bytes = 0
+        self.retries = dict.fromkeys(RETRY_REASONS, 0)
+        self.throttled = 0
+        self.rate_limit_wait = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    @property
+    def cache_hit_ratio(self):
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups else None
+
+    def to_dict(self):
+        return {
+            "requests": dict(self.requests),
+            "latency_seconds": self.latency.to_dict(),
+            "latency_p50_seconds": self.latency.quantile(0.5),
+            "latency_p95_seconds": self.latency.quantile(0.95),
+            "response_bytes": self.response_bytes,
+            "retries": dict(self.retries),
+            "throttled": self.throttled,
+            "rate_limit_wait_seconds": self.rate_limit_wait,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_ratio": self.cache_hit_ratio,
+        }
+
+
+class Metrics:
+    """
+    Thread-safe registry of API and pipeline stage metrics.
+
+    Args:
+        buckets (tuple): Upper bounds in seconds of the latency histograms.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._sinks = []
+        self.reset()
+
+    def reset(self):
+        """
+        Discards everything recorded so far. Registered sinks are kept.
+        """
+        with self._lock:
+            self.endpoints = {}
+            self.stages = {}
+
+    def add_sink(self, sink):
+        """
+        Registers a callable that receives every recorded event.
+
+        Events are dicts with a "type" key ("request", "retry", "wait",
+        "cache" or "stage") and the values passed to the matching `record_*`
+        method. Sinks are called on the recording thread, outside the
+        registry lock, and must not raise.
+        """
+        with self._lock:
+            self._sinks.append(sink)
+
+    def remove_sink(self, sink):
+        with self._lock:
+            self._sinks.remove(sink)
+
+    def _endpoint(self, endpoint):
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = EndpointMetrics(self.buckets)
+        return self.endpoints[endpoint]
+
+    def _emit(self, event):
+        for sink in list(self._sinks):
+            sink(event)
+
+    def record_request(self, endpoint, status, seconds, size=0):
+        """
+        Records one HTTP attempt.
+
+        Args:
+            endpoint (str): Endpoint name, e.g. "audio-features".
+            status (int or str): HTTP status code, or "error" when no
+                response was received.
+            seconds (float): Time until the response was received.
+            size (int): Length of the response body in bytes.
+        """
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            stats.requests[str(status)] = stats.requests.get(str(status), 0) + 1
+            stats.latency.observe(seconds)
+            stats.response_bytes += size
+            if status == 429:
+                stats.throttled += 1
+        self._emit(
+            {"type": "request", "endpoint": endpoint, "status": status, "seconds": seconds, "bytes": size}
+        )
+
+    def record_retry(self, endpoint, reason):
+        """
+        Records that a request is sent again; `reason` is one of `RETRY_REASONS`.
+        """
+        with self._lock:
+            retries = self._endpoint(endpoint).retries
+            retries[reason] = retries.get(reason, 0) + 1
+        self._emit({"type": "retry", "endpoint": endpoint, "reason": reason})
+
+    def record_wait(self, endpoint, seconds):
+        """
+        Records time a request spent waiting for the rate limiter.
+        """
+        with self._lock:
+            self._endpoint(endpoint).rate_limit_wait += seconds
+        self._emit({"type": "wait", "endpoint": endpoint, "seconds": seconds})
+
+    def record_cache(self, endpoint, hit):
+        """
+        Records a response cache lookup.
+        """
+        with self._lock:
+            stats = self._endpoint(endpoint)
+            if hit:
+                stats.cache_hits += 1
+            else:
+                stats.cache_misses += 1
+        self._emit({"type": "cache", "endpoint": endpoint, "hit": hit})
+
+    def record_stage(self, name, seconds):
+        """
+        Records the duration of one run of a pipeline stage.
+        """
+        with self._lock:
+            if name not in self.stages:
+                self.stages[name] = Histogram(self.buckets)
+            self.stages[name].observe(seconds)
+        self._emit({"type": "stage", "stage": name, "seconds": seconds})
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Times the enclosed block as a run of the pipeline stage `name`.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_stage(name, time.perf_counter() - start)
+
+    def snapshot(self):
+        """
+        Returns everything recorded so far as plain dicts.
+        """
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: stats.to_dict()
+                    for endpoint, stats in sorted(self.endpoints.items())
+                },
+                "stages": {
+                    name: histogram.to_dict()
+                    for name, histogram in sorted(self.stages.items())
+                },
+            }
+
+    def to_json(self, indent=2):
+        """
+        Returns the snapshot as a JSON document.
+        """
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self, prefix="spotify"):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def header(name, kind, help_text):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+
+        def histogram(name, labels, hist):
+            for bound, count in zip(hist.buckets + ("+Inf",), hist.cumulative()):
+                lines.append(f'{prefix}_{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f"{prefix}_{name}_sum{{{labels}}} {hist.sum}")
+            lines.append(f"{prefix}_{name}_count{{{labels}}} {hist.count}")
+
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            stages = sorted(self.stages.items())
+
+            header("requests_total", "counter", "HTTP attempts by endpoint and status.")
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.requests.items()):
+                    lines.append(
+                        f'{prefix}_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}'
+                    )
+            header("request_duration_seconds", "histogram", "Latency of HTTP attempts.")
+            for endpoint, stats in endpoints:
+                histogram("request_duration_seconds", f'endpoint="{endpoint}"', stats.latency)
+            header("response_bytes_total", "counter", "Bytes of response bodies received.")
+            for endpoint, stats in endpoints:
+                lines.append(
+                    f'{prefix}_response_bytes_total{{endpoint="{endpoint}"}} {stats.response_bytes}'
+                )
+            header("retries_total", "counter", "Requests sent again, by reason.")
+            for endpoint, stats in endpoints:
+                for reason, count in sorted(stats.retries.items()):
+                    lines.append(
+                        f'{prefix}_retries_total{{endpoint="{endpoint}",reason="{reason}"}} {count}'
+                    )
+            header("throttled_total", "counter", "Responses with status 429.")
+            for endpoint, stats in endpoints:
+                lines.append(f'{prefix}_throttled_total{{endpoint="{endpoint}"}} {stats.throttled}')
+            header("rate_limit_wait_seconds_total", "counter", "Time spent waiting for the rate limiter.")
+            for endpoint, stats in endpoints:
+                lines.append(
+                    f'{prefix}_rate_limit_wait_seconds_total{{endpoint="{endpoint}"}} {stats.rate_limit_wait}'
+                )
+            header("cache_lookups_total", "counter", "Response cache lookups by result.")
+            for endpoint, stats in endpoints:
+                lines.append(
+                    f'{prefix}_cache_lookups_total{{endpoint="{endpoint}",result="hit"}} {stats.cache_hits}'
+                )
+                lines.append(
+                    f'{prefix}_cache_lookups_total{{endpoint="{endpoint}",result="miss"}} {stats.cache_misses}'
+                )
+            header("stage_duration_seconds", "histogram", "Duration of pipeline stages.")
+            for name, hist in stages:
+                histogram("stage_duration_seconds", f'stage="{name}"', hist)
+        return "\n".join(lines) + "\n"
+
+
+_metrics = Metrics()
+
+
+def get_metrics():
+    """
+    Returns the process-wide registry used by the shared client and `stage`.
+    """
+    return _metrics
+
+
+def stage(name):
+    """
+    Times a block as a pipeline stage in the process-wide registry.
+
+    Example:
+        with stage("playlist.features"):
+            ...
+    """
+    return _metrics.stage(name)
+
+
+def timed(name):
+    """
+    Decorator timing every call of a function as the pipeline stage `name`.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with _metrics.stage(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,183 @@
+"""
+Local mood classification from audio features.
+
+The tracks found by the keyword searches of `classify_mood` serve as labelled
+examples: their audio features are standardized and averaged into one
+centroid per mood. Any batch of tracks is then assigned to the nearest mood
+centroid with a single matrix operation, so an entire library can be
+labelled without sending any search requests.
+"""
+
+import numpy as np
+
+from feature_store import FeatureStore
+from search_tracks import AUDIO_FEATURES, audio_features_array
+from track_records import track_ids
+
+
+class MoodClassifier:
+    """
+    Nearest-centroid classifier over standardized audio features.
+
+    :param features: Names of the feature columns used for classification.
+    """
+
+    def __init__(self, features=AUDIO_FEATURES):
+        self.features = list(features)
+        self.moods = []
+        self.mean = None
+        self.std = None
+        self.centroids = None
+
+    def _standardize(self, values):
+        standardized = (np.asarray(values, dtype=np.float64) - self.mean) / self.std
+        # Missing features count as average values
+        return np.nan_to_num(standardized, nan=0.0)
+
+    def fit(self, values, labels):
+        """
+        Learns one centroid per mood from labelled tracks.
+
+        :param values: Feature matrix of shape (tracks, len(features)).
+        :param labels: Mood of every row.
+        :return: The fitted classifier.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        labels = np.asarray(labels)
+        self.mean = np.nanmean(values, axis=0)
+        std = np.nanstd(values, axis=0)
+        self.std = np.where(std > 0, std, 1.0)
+
+        standardized = self._standardize(values)
+        self.moods, codes = np.unique(labels, return_inverse=True)
+        self.moods = self.moods.tolist()
+        # Sum the rows of every mood at once, then divide by the mood sizes
+        sums = np.zeros((len(self.moods), values.shape[1]))
+        np.add.at(sums, codes, standardized)
+        self.centroids = sums / np.bincount(codes)[:, np.newaxis]
+        return self
+
+    def distances(self, values):
+        """
+        Computes the squared distance of every track to every mood centroid.
+
+        :param values: Feature matrix of shape (tracks, len(features)).
+        :return: Matrix of shape (tracks, len(moods)).
+        """
+        standardized = self._standardize(values)
+        distances = (
+            (standardized**2).sum(axis=1)[:, np.newaxis]
+            - 2 * standardized @ self.centroids.T
+            + (self.centroids**2).sum(axis=1)
+        )
+        return np.maximum(distances, 0.0)
+
+    def predict(self, values):
+        """
+        Assigns every track to its nearest mood.
+
+        :param values: Feature matrix of shape (tracks, len(features)).
+        :return: Array with the mood of every row.
+        """
+        return np.asarray(self.moods)[self.distances(values).argmin(axis=1)]
+
+    def predict_proba(self, values):
+        """
+        Converts the centroid distances to mood probabilities (softmax of -distance).
+
+        :return: Matrix of shape (tracks, len(moods)); rows sum to 1.
+        """
+        scores = -self.distances(values)
+        scores -= scores.max(axis=1, keepdims=True)
+        weights = np.exp(scores)
+        return weights / weights.sum(axis=1, keepdims=True)
+
+    def save(self, path):
+        """
+        Saves the fitted classifier to a NumPy archive (.npz).
+        """
+        np.savez(
+            path,
+            features=np.asarray(self.features),
+            moods=np.asarray(self.moods),
+            mean=self.mean,
+            std=self.std,
+            centroids=self.centroids,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a classifier saved with `save`.
+        """
+        with np.load(path) as data:
+            classifier = cls(features=data["features"].tolist())
+            classifier.moods = data["moods"].tolist()
+            classifier.mean = data["mean"]
+            classifier.std = data["std"]
+            classifier.centroids = data["centroids"]
+        return classifier
+
+
+def training_data(mood_store, feature_store=None, features=AUDIO_FEATURES, fetch_missing=True):
+    """
+    Collects the features of the keyword-seeded tracks of every stored mood.
+
+    :param mood_store: MoodStore with the tracks found per mood.
+    :param feature_store: FeatureStore with audio features. Defaults to the
+                          store in `feature_store.STORE_PATH`.
+    :param features: Feature columns to return.
+    :param fetch_missing: Fetch the audio features of seed tracks missing from
+                          the feature store. They are only used for training and
+                          are not written to the shared store, since their names
+                          and popularity are unknown.
+    :return: Tuple of the feature matrix and the mood of every row.
+    """
+    feature_store = FeatureStore() if feature_store is None else feature_store
+    seeds = mood_store.load_all()
+    seed_ids = {id for df in seeds.values() for id in df["Track ID"]}
+
+    index = feature_store.index
+    data = feature_store.load(columns=features)
+    matrix = np.column_stack([data[feature] for feature in features])
+    # Row in `matrix` of every fetched seed track that is not stored
+    fetched_rows = {}
+    missing = [id for id in seed_ids if id not in index]
+    if missing and fetch_missing:
+        fetched = audio_features_array(missing)
+        fetched_rows = {
+            id: len(matrix) + row for row, id in enumerate(track_ids(fetched))
+        }
+        matrix = np.vstack(
+            [matrix, np.column_stack([fetched[feature] for feature in features])]
+        )
+
+    rows, labels = [], []
+    for mood, df in seeds.items():
+        for id in df["Track ID"]:
+            row = index.get(id, fetched_rows.get(id))
+            if row is not None:
+                rows.append(row)
+                labels.append(mood)
+    return matrix[np.asarray(rows, dtype=np.int64)], np.asarray(labels)
+
+
+def classify_store(classifier, feature_store=None, playlist=None):
+    """
+    Assigns every track of a feature store (or of one stored playlist) to a mood.
+
+    :param classifier: A fitted MoodClassifier.
+    :param feature_store: Defaults to the store in `feature_store.STORE_PATH`.
+    :param playlist: Only classify the tracks of this stored playlist.
+    :return: DataFrame with the columns "id", "name" and "mood".
+    """
+    import pandas as pd
+
+    feature_store = FeatureStore() if feature_store is None else feature_store
+    data = feature_store.load(
+        columns=["id", "name", *classifier.features], playlist=playlist
+    )
+    values = np.column_stack([data[feature] for feature in classifier.features])
+    return pd.DataFrame(
+        {"id": data["id"], "name": data["name"], "mood": classifier.predict(values)}
+    )
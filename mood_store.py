@@ -0,0 +1,138 @@
+"""
+Append-only store of the tracks found for each mood.
+
+Rows are only ever inserted, and the primary key on (mood, track ID) is the
+persisted index that deduplicates them in constant time. A batch of moods is
+written in a single SQLite transaction, so a refresh is either committed
+completely or not at all. Loading one mood reads only that mood's rows
+through the same index, instead of parsing the whole file.
+"""
+
+import sqlite3
+
+# Default location of the mood store
+MOOD_STORE_PATH = "moods.sqlite"
+
+# Columns of the DataFrames written and returned by the store
+MOOD_COLUMNS = ["Section", "Track ID", "Song Name", "Artist Name"]
+
+
+class MoodStore:
+    """
+    SQLite-backed mood -> tracks store.
+
+    :param path: Location of the SQLite database.
+    """
+
+    def __init__(self, path=MOOD_STORE_PATH):
+        self.path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS mood_tracks (
+                mood TEXT NOT NULL,
+                track_id TEXT NOT NULL,
+                song_name TEXT,
+                artist_name TEXT,
+                PRIMARY KEY (mood, track_id)
+            )
+            """
+        )
+        self._connection.commit()
+
+    def add(self, df_dict):
+        """
+        Appends the tracks of several moods in one atomic commit.
+
+        Tracks already stored for a mood are skipped.
+
+        :param df_dict: Dictionary of mood DataFrames with the columns of
+                        `MOOD_COLUMNS`, as returned by `classify_mood.to_pd`.
+        :return: Dictionary mapping each mood to the number of new tracks.
+        """
+        added = {}
+        with self._connection:
+            for mood, df in df_dict.items():
+                rows = zip(
+                    [mood] * len(df),
+                    df["Track ID"],
+                    df["Song Name"],
+                    df["Artist Name"],
+                )
+                before = self._connection.total_changes
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO mood_tracks VALUES (?, ?, ?, ?)", rows
+                )
+                added[mood] = self._connection.total_changes - before
+        return added
+
+    def contains(self, mood, track_id):
+        """
+        Returns whether a track is stored for a mood.
+        """
+        row = self._connection.execute(
+            "SELECT 1 FROM mood_tracks WHERE mood = ? AND track_id = ?",
+            (mood, track_id),
+        ).fetchone()
+        return row is not None
+
+    def moods(self):
+        """
+        Returns the names of the stored moods, in insertion order.
+        """
+        rows = self._connection.execute(
+            "SELECT mood FROM mood_tracks GROUP BY mood ORDER BY MIN(rowid)"
+        )
+        return [mood for (mood,) in rows]
+
+    def load(self, mood):
+        """
+        Loads the tracks of one mood, in insertion order.
+
+        :return: DataFrame with the columns of `MOOD_COLUMNS`.
+        """
+        import pandas as pd
+
+        rows = self._connection.execute(
+            "SELECT mood, track_id, song_name, artist_name FROM mood_tracks "
+            "WHERE mood = ? ORDER BY rowid",
+            (mood,),
+        ).fetchall()
+        return pd.DataFrame(rows, columns=MOOD_COLUMNS)
+
+    def load_all(self):
+        """
+        Loads every mood.
+
+        :return: Dictionary mapping each mood to its DataFrame.
+        """
+        return {mood: self.load(mood) for mood in self.moods()}
+
+    def import_csv(self, filepath):
+        """
+        Imports a moods CSV with a "Track ID" column per row.
+
+        Rows without a track ID are skipped, since they cannot be deduplicated.
+        The former `write_csv` only wrote song and artist names, so its files
+        cannot be imported; run the mood search again (`python cli.py moods`)
+        to rebuild those moods instead.
+
+        :return: Dictionary mapping each mood to the number of new tracks.
+        :raises ValueError: If the file has no "Track ID" column.
+        """
+        import pandas as pd
+
+        moods_raw = pd.read_csv(filepath)
+        if "Track ID" not in moods_raw:
+            raise ValueError(
+                f"{filepath} has no 'Track ID' column; moods CSVs written by the former "
+                "write_csv only hold song and artist names and cannot be imported. "
+                "Run `python cli.py moods` to rebuild the mood store instead."
+            )
+        moods_raw = moods_raw.dropna(subset=["Track ID"])
+        return self.add(
+            {mood: df for mood, df in moods_raw.groupby("Section", sort=False)}
+        )
+
+    def close(self):
+        self._connection.close()
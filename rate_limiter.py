@@ -0,0 +1,138 @@
+"""
+Client-side rate limiting shared by all Spotify API calls.
+
+Requests draw from a global token bucket and, optionally, from a bucket per
+endpoint (e.g. "search" or "audio-features"). When the API answers with 429
+the limiter pauses every caller until the `Retry-After` delay has passed,
+instead of sleeping for a fixed time whether it is needed or not.
+"""
+
+import random
+import threading
+import time
+
+# Sustained requests per second and burst size of the global bucket
+DEFAULT_RATE = 20.0
+DEFAULT_BURST = 40
+# Delay assumed when a 429 response carries no usable Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+# Base and maximum delay in seconds for the exponential backoff on 5xx errors
+BACKOFF_BASE = 0.5
+BACKOFF_CAP = 30.0
+
+
+class TokenBucket:
+    """
+    Token bucket allowing `rate` acquisitions per second with bursts of `burst`.
+
+    Args:
+        rate (float): Number of tokens added per second.
+        burst (int): Maximum number of tokens held by the bucket.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """
+        Takes one token, going into debt if the bucket is empty.
+
+        Returns:
+            float: Seconds the caller has to wait before using the token.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.burst, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def acquire(self):
+        """
+        Blocks until a token is available.
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """
+    Returns a "full jitter" exponential backoff delay.
+
+    Args:
+        attempt (int): Number of the retry, starting at 0.
+        base (float): Delay scale in seconds.
+        cap (float): Upper bound of the delay in seconds.
+
+    Returns:
+        float: A random delay between 0 and min(cap, base * 2 ** attempt).
+    """
+    return random.uniform(0, min(cap, base * 2**attempt))
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """
+    Converts a `Retry-After` header value (in seconds) to a float.
+    """
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """
+    Global and per-endpoint request budgets with a shared 429 pause.
+
+    Args:
+        rate (float): Sustained requests per second across all endpoints.
+        burst (int): Burst size across all endpoints.
+        endpoint_budgets (dict): Maps an endpoint name such as "search" to a
+            `(rate, burst)` tuple limiting that endpoint further.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, endpoint_budgets=None):
+        self.bucket = TokenBucket(rate, burst)
+        self.endpoint_buckets = {
+            endpoint: TokenBucket(*budget)
+            for endpoint, budget in (endpoint_budgets or {}).items()
+        }
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, endpoint=None):
+        """
+        Blocks until a request to `endpoint` may be sent.
+        """
+        self.wait_for_pause()
+        bucket = self.endpoint_buckets.get(endpoint)
+        if bucket is not None:
+            bucket.acquire()
+        self.bucket.acquire()
+
+    def wait_for_pause(self):
+        """
+        Blocks while a pause requested through `pause` is in effect.
+        """
+        while True:
+            with self._lock:
+                remaining = self._paused_until - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+    def pause(self, seconds):
+        """
+        Holds back every request for `seconds`, e.g. after a 429 response.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
@@ -0,0 +1,172 @@
+"""
+Offline nearest-neighbour recommendations over the cached audio features.
+
+Instead of asking the remote /recommendations endpoint (one request, at most
+100 tracks), the tracks of the feature store are indexed as normalized
+feature vectors and searched locally. A playlist profile from
+`audio_values_range` supplies the target (its median by default) and,
+optionally, the min/max range every recommended track has to fall into.
+The search runs over fixed-size blocks of the catalogue, so memory stays
+bounded while every block is scored with vectorized NumPy operations.
+"""
+
+import numpy as np
+
+from feature_store import FeatureStore
+from search_tracks import AUDIO_FEATURES
+
+# Number of tracks scored per block of the distance search
+DEFAULT_BLOCK_SIZE = 65536
+
+
+class NearestNeighbourRecommender:
+    """
+    Index of track feature vectors, min-max normalized per feature.
+
+    Tracks with a missing feature are left out of the index.
+
+    Args:
+        ids (array): Track IDs, one per row of `values`.
+        values (ndarray): Feature matrix of shape (tracks, len(features)).
+        features (list): Names of the feature columns.
+        block_size (int): Number of tracks scored per block.
+    """
+
+    def __init__(self, ids, values, features=AUDIO_FEATURES, block_size=DEFAULT_BLOCK_SIZE):
+        values = np.asarray(values, dtype=np.float32)
+        complete = ~np.isnan(values).any(axis=1)
+        self.ids = np.asarray(ids)[complete]
+        self.values = values[complete]
+        self.features = list(features)
+        self.block_size = block_size
+
+        # Scale every feature to [0, 1] so tempo and loudness do not dominate
+        if len(self.values):
+            self.minimum = self.values.min(axis=0)
+            spread = self.values.max(axis=0) - self.minimum
+        else:
+            self.minimum = np.zeros(len(self.features), dtype=np.float32)
+            spread = np.ones(len(self.features), dtype=np.float32)
+        self.scale = np.where(spread > 0, spread, 1.0).astype(np.float32)
+        self.normalized = (self.values - self.minimum) / self.scale
+        self._row_index = None
+
+    @classmethod
+    def from_store(cls, store=None, features=AUDIO_FEATURES, **kwargs):
+        """
+        Builds the index from every track of a feature store.
+
+        Parameters:
+        - store (FeatureStore): Defaults to the store in `feature_store.STORE_PATH`.
+        - features (list): Feature columns to index.
+        """
+        store = FeatureStore() if store is None else store
+        data = store.load(columns=["id", *features])
+        values = np.column_stack([data[feature] for feature in features])
+        return cls(data["id"], values, features=features, **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def row_index(self):
+        """
+        Mapping of track ID to row number, built on first use.
+        """
+        if self._row_index is None:
+            self._row_index = {id: row for row, id in enumerate(self.ids.tolist())}
+        return self._row_index
+
+    def normalize(self, vector):
+        """
+        Applies the index normalization to a vector of raw feature values.
+        """
+        return (np.asarray(vector, dtype=np.float32) - self.minimum) / self.scale
+
+    def search(self, target, k=100, lower=None, upper=None, exclude=None):
+        """
+        Finds the `k` tracks closest to a target feature vector.
+
+        Parameters:
+        - target (array): Raw feature values, in the order of `features`.
+          Features whose target is NaN do not count towards the distance.
+        - k (int): Number of tracks to return.
+        - lower, upper (array): Optional raw bounds per feature; tracks outside
+          them are skipped. NaN disables the bound of a feature.
+        - exclude (iterable): Track IDs that must not be returned.
+
+        Returns:
+        - tuple: Row numbers and Euclidean distances (in normalized space) of
+                 the closest tracks, nearest first.
+        """
+        target = self.normalize(target)
+        active = ~np.isnan(target)
+        target = target[active]
+        excluded = None
+        if exclude is not None:
+            excluded = np.zeros(len(self), dtype=bool)
+            excluded[[self.row_index[id] for id in exclude if id in self.row_index]] = True
+        best_rows = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0, dtype=np.float32)
+
+        for start in range(0, len(self), self.block_size):
+            stop = min(start + self.block_size, len(self))
+            block = self.normalized[start:stop][:, active]
+            distances = ((block - target) ** 2).sum(axis=1)
+            keep = np.ones(stop - start, dtype=bool)
+            if lower is not None:
+                keep &= (np.isnan(lower) | (self.values[start:stop] >= lower)).all(axis=1)
+            if upper is not None:
+                keep &= (np.isnan(upper) | (self.values[start:stop] <= upper)).all(axis=1)
+            if excluded is not None:
+                keep &= ~excluded[start:stop]
+            rows = np.flatnonzero(keep)
+            distances = distances[rows]
+
+            # Keep only the k best of this block merged with the best so far
+            if len(rows) > k:
+                top = np.argpartition(distances, k)[:k]
+                rows, distances = rows[top], distances[top]
+            best_rows = np.concatenate([best_rows, rows + start])
+            best_distances = np.concatenate([best_distances, distances])
+            if len(best_rows) > k:
+                top = np.argpartition(best_distances, k)[:k]
+                best_rows, best_distances = best_rows[top], best_distances[top]
+
+        order = np.argsort(best_distances, kind="stable")
+        return best_rows[order], np.sqrt(best_distances[order])
+
+    def recommend(self, audio_metrics, k=100, target="Median", within_range=True, exclude=None):
+        """
+        Recommends the tracks closest to a playlist profile.
+
+        Parameters:
+        - audio_metrics (DataFrame): Profile from `audio_values_range`, with
+          statistics as index and features as columns.
+        - k (int): Number of tracks to return.
+        - target (str): Statistic used as the target vector, e.g. "Median" or "mean".
+        - within_range (bool): Only return tracks whose features lie between
+          the profile's "min" and "max".
+        - exclude (iterable): Track IDs that must not be returned, e.g. the
+          tracks of the profiled playlist.
+
+        Returns:
+        - DataFrame: Track ID, distance and feature values, nearest first.
+        """
+        import pandas as pd
+
+        # Features missing from the profile do not restrict the search
+        profile = audio_metrics.reindex(columns=self.features)
+        target_vector = profile.loc[target].to_numpy(dtype=np.float32)
+        lower = upper = None
+        if within_range:
+            lower = profile.loc["min"].to_numpy(dtype=np.float32)
+            upper = profile.loc["max"].to_numpy(dtype=np.float32)
+
+        rows, distances = self.search(
+            target_vector, k=k, lower=lower, upper=upper, exclude=exclude
+        )
+        recommendations = pd.DataFrame(self.values[rows], columns=self.features)
+        recommendations.insert(0, "distance", distances)
+        recommendations.insert(0, "id", self.ids[rows])
+        return recommendations
@@ -0,0 +1,230 @@
+"""
+Persistent on-disk cache for Spotify API responses.
+
+Track metadata, audio features, artist info, genre seeds and markets rarely
+change, so their response bodies are stored in a local SQLite database and
+reused across runs until their time-to-live expires. Entries are keyed by the
+endpoint path and its normalized query parameters. When the database grows
+beyond its size limit, the least recently used entries are evicted. Access
+times of cache hits are kept in memory and written in batches, so reads do
+not wait for a disk write.
+"""
+
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+# Default location of the cache database
+CACHE_PATH = "spotify_cache.sqlite"
+
+DAY = 24 * 60 * 60
+# Time to live in seconds per resource type. Other resources are not cached.
+DEFAULT_TTLS = {
+    "tracks": 7 * DAY,
+    "audio-features": 30 * DAY,
+    "artists": 1 * DAY,
+    "genre-seeds": 7 * DAY,
+    "markets": 7 * DAY,
+}
+# Total size of the cached bodies above which old entries are evicted
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+# Buffered access times are written once this many are pending, or after this many seconds
+ACCESS_FLUSH_SIZE = 1000
+ACCESS_FLUSH_INTERVAL = 30.0
+
+
+class CacheMiss(LookupError):
+    """
+    Raised in cache-only mode when a request is not served by the cache.
+    """
+
+
+def resource_type(path):
+    """
+    Returns the resource type of an endpoint path, used to look up its TTL.
+
+    The path is relative to the API base URL, e.g. "/tracks" or
+    "/artists/{id}". The type is its first segment, except for "genre-seeds"
+    (available genre seeds).
+    """
+    segments = [segment for segment in path.split("/") if segment]
+    if not segments:
+        return ""
+    if segments[-1] == "available-genre-seeds":
+        return "genre-seeds"
+    return segments[0]
+
+
+def cache_key(method, url, params=None):
+    """
+    Builds a cache key from the request method, URL path and parameters.
+
+    Query parameters from the URL and from `params` are merged and sorted by
+    name, so equivalent requests share an entry. Parameter values are kept as
+    they are; e.g. the order of "ids" matters because it sets the response order.
+    """
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        items = params.items() if hasattr(params, "items") else params
+        query += [(str(key), str(value)) for key, value in items if value is not None]
+    query.sort(key=lambda pair: pair[0])
+    return f"{method.upper()} {parts.path}?{urlencode(query)}"
+
+
+class ResponseCache:
+    """
+    SQLite-backed store of response bodies with per-resource TTLs.
+
+    Args:
+        path (str): Location of the SQLite database.
+        ttls (dict): Time to live in seconds per resource type (see `resource_type`).
+        max_bytes (int): Total body size above which the least recently used
+            entries are evicted.
+        cache_only (bool): If True, requests that cannot be served from the
+            cache raise `CacheMiss` instead of going to the network.
+    """
+
+    def __init__(
+        self,
+        path=CACHE_PATH,
+        ttls=None,
+        max_bytes=DEFAULT_MAX_BYTES,
+        cache_only=False,
+    ):
+        self.path = path
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_bytes = max_bytes
+        self.cache_only = cache_only
+        self._lock = threading.Lock()
+        # Access times of cache hits not written to the database yet
+        self._accessed = {}
+        self._flushed_at = time.time()
+        # A single connection shared by all threads, serialized by the lock
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                resource TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)"
+        )
+        self._connection.commit()
+        self._size = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+    def ttl_for(self, resource):
+        """
+        Returns the TTL in seconds of a resource type, or None if it is not cached.
+        """
+        return self.ttls.get(resource)
+
+    def get(self, key):
+        """
+        Returns the cached body for `key`, or None if it is missing or expired.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT body, size, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            body, size, expires_at = row
+            if expires_at <= now:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._size -= size
+                self._connection.commit()
+                return None
+            self._accessed[key] = now
+            if (
+                len(self._accessed) >= ACCESS_FLUSH_SIZE
+                or now - self._flushed_at >= ACCESS_FLUSH_INTERVAL
+            ):
+                self._flush_accessed()
+                self._connection.commit()
+            return bytes(body)
+
+    def set(self, key, resource, body, ttl):
+        """
+        Stores a response body for `ttl` seconds and evicts old entries if needed.
+        """
+        now = time.time()
+        with self._lock:
+            old = self._connection.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, resource, sqlite3.Binary(body), len(body), now + ttl, now),
+            )
+            self._accessed.pop(key, None)
+            # Written in the same transaction, without a commit of their own
+            self._flush_accessed()
+            self._size += len(body) - (old[0] if old else 0)
+            if self._size > self.max_bytes:
+                self._evict()
+            self._connection.commit()
+
+    def _flush_accessed(self):
+        """
+        Writes the buffered access times without committing. Called with the lock held.
+        """
+        if self._accessed:
+            self._connection.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._accessed.items()],
+            )
+            self._accessed.clear()
+        self._flushed_at = time.time()
+
+    def _evict(self):
+        """
+        Deletes expired entries, then least recently used ones, until the
+        total size is below 90% of `max_bytes`. Called with the lock held.
+        """
+        self._connection.execute(
+            "DELETE FROM responses WHERE expires_at <= ?", (time.time(),)
+        )
+        target = self.max_bytes * 0.9
+        total = self._connection.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+        rows = self._connection.execute(
+            "SELECT key, size FROM responses ORDER BY accessed_at"
+        ).fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self._connection.executemany("DELETE FROM responses WHERE key = ?", evicted)
+        self._size = total
+
+    def clear(self):
+        """
+        Removes every entry from the cache.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM responses")
+            self._connection.commit()
+            self._accessed.clear()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._flush_accessed()
+            self._connection.commit()
+            self._connection.close()
@@ -0,0 +1,182 @@
+"""
+Single-pass decoding of Spotify API response bodies.
+
+Every response body is decoded exactly once through `decode`, which keeps the
+result on the response object. The fastest installed decoder is used: orjson
+or msgspec when available, the standard library `json` module otherwise.
+
+For the large, hot responses (playlist pages, track and audio feature
+batches, searches, related artists) `decode` can also produce typed structs
+holding only the fields the project uses. With msgspec installed, the body is
+decoded straight into `msgspec.Struct` types and every other field is skipped
+while parsing; without it, the same structs are built from the decoded dicts.
+"""
+
+import json
+from typing import List, Optional, Union, get_args, get_origin
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+# Decoder used for untyped bodies, in order of preference
+if orjson is not None:
+    BACKEND = "orjson"
+    loads = orjson.loads
+elif msgspec is not None:
+    BACKEND = "msgspec"
+    loads = msgspec.json.decode
+else:
+    BACKEND = "json"
+    loads = json.loads
+
+
+class _Struct:
+    """
+    Fallback base class of the response structs when msgspec is not installed.
+    """
+
+    __slots__ = ()
+    # (name, type, default) of every field
+    _fields = ()
+
+    def __init__(self, **kwargs):
+        for name, _, default in self._fields:
+            value = kwargs.get(name, default)
+            # Copy mutable defaults, like msgspec does
+            setattr(self, name, list(value) if value is default and isinstance(value, list) else value)
+
+    def __eq__(self, other):
+        return type(self) is type(other) and all(
+            getattr(self, name) == getattr(other, name) for name, _, _ in self._fields
+        )
+
+    def __repr__(self):
+        values = ", ".join(f"{name}={getattr(self, name)!r}" for name, _, _ in self._fields)
+        return f"{type(self).__name__}({values})"
+
+
+def _struct(name, fields):
+    """
+    Defines a response struct from (name, type, default) field tuples.
+    """
+    if msgspec is not None:
+        return msgspec.defstruct(name, fields)
+    return type(name, (_Struct,), {"__slots__": tuple(f[0] for f in fields), "_fields": tuple(fields)})
+
+
+def _convert(value, annotation):
+    """
+    Converts a decoded JSON value to `annotation` (fallback for msgspec's typed decoding).
+    """
+    if value is None:
+        return None
+    if isinstance(annotation, type) and issubclass(annotation, _Struct):
+        return annotation(
+            **{
+                name: _convert(value[name], field_type)
+                for name, field_type, _ in annotation._fields
+                if name in value
+            }
+        )
+    origin = get_origin(annotation)
+    if origin in (list, List):
+        (item_type,) = get_args(annotation)
+        return [_convert(item, item_type) for item in value]
+    if origin is Union:
+        item_type = next(arg for arg in get_args(annotation) if arg is not type(None))
+        return _convert(value, item_type)
+    return value
+
+
+# Every scalar field is Optional, since the API returns null for some tracks
+# (e.g. local files) and a single null must not fail the whole page
+Artist = _struct("Artist", [("id", Optional[str], None), ("name", Optional[str], "")])
+Album = _struct("Album", [("id", Optional[str], None), ("name", Optional[str], "")])
+Track = _struct(
+    "Track",
+    [
+        ("id", Optional[str], None),
+        ("name", Optional[str], ""),
+        ("popularity", Optional[int], 0),
+        ("uri", Optional[str], ""),
+        ("artists", List[Artist], []),
+        ("album", Optional[Album], None),
+    ],
+)
+PlaylistItem = _struct("PlaylistItem", [("track", Optional[Track], None)])
+PlaylistPage = _struct(
+    "PlaylistPage", [("items", List[PlaylistItem], []), ("next", Optional[str], None)]
+)
+Tracks = _struct("Tracks", [("tracks", List[Optional[Track]], [])])
+TrackPaging = _struct("TrackPaging", [("items", List[Optional[Track]], [])])
+TrackSearch = _struct("TrackSearch", [("tracks", Optional[TrackPaging], None)])
+RelatedArtists = _struct("RelatedArtists", [("artists", List[Artist], [])])
+# Same names as `search_tracks.AUDIO_FEATURES`
+AudioFeatures = _struct(
+    "AudioFeatures",
+    [("id", Optional[str], None)]
+    + [
+        (feature, Optional[float], None)
+        for feature in (
+            "danceability",
+            "energy",
+            "loudness",
+            "speechiness",
+            "acousticness",
+            "instrumentalness",
+            "liveness",
+            "valence",
+            "tempo",
+        )
+    ],
+)
+AudioFeaturesPage = _struct(
+    "AudioFeaturesPage", [("audio_features", List[Optional[AudioFeatures]], [])]
+)
+
+
+def decode_body(content, type=None):
+    """
+    Decodes a JSON body.
+
+    Args:
+        content (bytes): The raw body.
+        type: Optional struct type (e.g. `PlaylistPage`) to decode into.
+
+    Returns:
+        The decoded dicts and lists, or an instance of `type`.
+    """
+    if type is None:
+        return loads(content)
+    if msgspec is not None:
+        return msgspec.json.decode(content, type=type)
+    return _convert(loads(content), type)
+
+
+def decode(response, type=None):
+    """
+    Decodes the body of a `requests.Response` exactly once.
+
+    The result is kept on the response, so decoding the same response again
+    (with the same type) returns the same object without parsing the body.
+
+    Args:
+        response (requests.Response): The response to decode.
+        type: Optional struct type to decode into.
+
+    Returns:
+        The decoded body, see `decode_body`.
+    """
+    cached = getattr(response, "_decoded", None)
+    if cached is not None and cached[0] is type:
+        return cached[1]
+    value = decode_body(response.content, type)
+    response._decoded = (type, value)
+    return value
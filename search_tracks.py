@@ -1,33 +1,38 @@
-from requests import post, get
-import json
+from spotify_client import get, post
+from functools import partial
 
-from init_spotify_api import token, headers
+import numpy as np
+
+from batching import DEFAULT_MAX_WORKERS, map_batches
+from response_json import AudioFeaturesPage, Track, Tracks, decode
+from track_records import AUDIO_FEATURES, build_tracks
 
 
 # get song name given the ID
-def single_song_info(token, headers, id):
+def single_song_info(id, token=None, headers=None):
     """
     Retrieves the name and primary artist of a single track given its Spotify ID.
 
     Parameters:
-        token (str): Authentication token for Spotify API.
-        headers (dict): Headers for the API request, including authorization.
         id (str): The Spotify ID of the track.
+        token (str): Unused, the shared client manages the token.
+        headers (dict): Optional headers overriding the client's authorization.
 
     Returns:
         tuple: A tuple containing the name of the song and the name of its primary artist.
     """
 
     # Construct the URL for the API request using the track ID
-    url = f"https://api.spotify.com/v1/tracks/{id}?market=US"
+    url = f"/tracks/{id}?market=US"
 
     # Make the GET request to Spotify API
     result = get(url, headers=headers)
 
-    # Parse the JSON response to extract song and artist names
-    song_name = json.loads(result.content)["name"]
-    artist_name = json.loads(result.content)["artists"][0]["name"]
-    # artist_id = json.loads(result.content)["artists"][0]["id"]
+    # Parse the JSON response once to extract song and artist names
+    track = decode(result, Track)
+    song_name = track.name
+    artist_name = track.artists[0].name
+    # artist_id = track.artists[0].id
 
     return song_name, artist_name  # , artist_id
 
@@ -35,42 +40,48 @@ def single_song_info(token, headers, id):
     token = token, headers = headers, id = "5wG3HvLhF6Y5KTGlK0IW3J"
 
 
-def multiple_song_info(token, headers, ids):
+# Maximum number of IDs accepted by the tracks endpoint per call
+TRACKS_BATCH_SIZE = 50
+
+
+def _song_info_batch(ids, headers=None):
+    """
+    Requests the track objects of at most 50 tracks in a single API call.
+
+    Returns:
+        list: The `Track` structs in request order; None for unknown IDs.
+    """
+    result = get(
+        "/tracks", params={"market": "US", "ids": ",".join(ids)}, headers=headers
+    )
+    result.raise_for_status()
+    return decode(result, Tracks).tracks
+
+
+def multiple_song_info(ids, token=None, headers=None, max_workers=DEFAULT_MAX_WORKERS):
     """
     Retrieves details for multiple tracks based on their Spotify IDs.
 
+    The IDs are split into batches of 50, the limit of Spotify's "Get Several Tracks"
+    endpoint, which are requested concurrently.
+
     Parameters:
-        token (str): Authentication token for Spotify API.
-        headers (dict): Headers for the API request, including authorization.
-        ids (list): A list of Spotify track IDs.
+        ids (iterable): Spotify track IDs, e.g. a list or a dict keyed by track ID.
+        token (str): Unused, the shared client manages the token.
+        headers (dict): Optional headers overriding the client's authorization.
+        max_workers (int): Maximum number of batches requested at the same time.
 
     Returns:
         dict: A dictionary with track IDs as keys and a list containing the track's name and primary artist as values.
     """
     songs = {}
-    print(ids)
-    ids_string = ""
-    # Concatenate track IDs into a comma-separated string for the API request
-    for id in ids.keys():
-        ids_string += str(id) + ","
-
-    # Construct the URL for fetching details of multiple tracks
-    url = f"https://api.spotify.com/v1/tracks?market=US&ids={ids_string}"
+    fetch_batch = partial(_song_info_batch, headers=headers)
 
-    # Make the GET request to Spotify API
-    result = get(url, headers=headers)
-    result = json.loads(result.content)
-
-    # Iterate through the response to populate the songs dictionary
-    for id in ids:
-        for k in range(len(ids)):
-            artist_name = result["tracks"][k]["artists"][0]["name"]
-            song_name = result["tracks"][k]["name"]
-
-            songs[id] = [
-                song_name,
-                artist_name,
-            ]
+    for batch, tracks in map_batches(fetch_batch, ids, TRACKS_BATCH_SIZE, max_workers):
+        # The endpoint answers in request order, so each track lines up with its ID
+        for id, track in zip(batch, tracks):
+            if track:
+                songs[id] = [track.name, track.artists[0].name]
 
     return songs
 
@@ -82,65 +93,112 @@ def multiple_song_info(token, headers, ids):
     )
 
 
-def multiple_audio_feat(token, headers, ids):
+# Maximum number of IDs accepted by the audio features endpoint per call
+AUDIO_FEATURES_BATCH_SIZE = 100
+
+
+def _audio_features_batch(ids, headers=None):
+    """
+    Requests the audio features of at most 100 tracks in a single API call.
+
+    Returns:
+        list: The `AudioFeatures` structs; None for unknown IDs.
+    """
+    result = get("/audio-features", params={"ids": ",".join(ids)}, headers=headers)
+    result.raise_for_status()
+    return decode(result, AudioFeaturesPage).audio_features
+
+
+def multiple_audio_feat(ids, token=None, headers=None, max_workers=DEFAULT_MAX_WORKERS):
     """
     Fetches audio features for multiple tracks from Spotify and organizes them into a dictionary.
 
-    This function makes a single API call to Spotify's "Get Audio Features for Several Tracks"
-    endpoint using a list of track IDs. It then parses the response to create a structured
-    dictionary mapping each track ID to its audio features.
+    The IDs are split into batches of 100, the limit of Spotify's "Get Audio Features
+    for Several Tracks" endpoint, and the batches are requested concurrently. Each
+    returned feature object is matched to its track through its "id" field.
 
     Parameters:
-    - token (str): Spotify API authentication token.
-    - headers (dict): Request headers containing authorization information.
-    - ids (dict): A dictionary where keys are Spotify track IDs.
+    - ids (iterable): Spotify track IDs, e.g. a dict keyed by track ID or a generator.
+      Generators are consumed lazily, so requests start before they are exhausted.
+    - token (str): Unused, the shared client manages the token.
+    - headers (dict): Optional headers overriding the client's authorization.
+    - max_workers (int): Maximum number of batches requested at the same time.
 
     Returns:
     - dict: A dictionary mapping track IDs to their respective audio features.
 
     Each entry in the return dictionary contains a subset of predefined audio features
-    (e.g., danceability, energy) for the corresponding track.
+    (e.g., danceability, energy) for the corresponding track. Tracks without audio
+    features map to an empty dictionary. For large inputs, `audio_features_array`
+    returns the same data as a compact track array.
     """
+    playlist_info = {}
+    fetch_batch = partial(_audio_features_batch, headers=headers)
+
+    for batch, result in map_batches(
+        fetch_batch, ids, AUDIO_FEATURES_BATCH_SIZE, max_workers
+    ):
+        # Keep the input order, including tracks the API has no features for
+        for track_id in batch:
+            playlist_info.setdefault(track_id, {})
+        for result_k in result:
+            # Check if result_k is not None
+            if result_k:
+                playlist_info[result_k.id] = {
+                    key: value
+                    for key in AUDIO_FEATURES
+                    if (value := getattr(result_k, key)) is not None
+                }
 
-    # Initialize a dictionary to hold the audio features for each track
-    playlist_info = {id: {} for id in ids.keys()}
-
-    # Define the audio features to be retrieved
-    features = [
-        "danceability",
-        "energy",
-        "loudness",
-        "speechiness",
-        "acousticness",
-        "instrumentalness",
-        "liveness",
-        "valence",
-        "tempo",
-    ]
-    # Create ID's string for API call
-    ids_string = ""
-    for id in ids.keys():
-        ids_string += str(id) + ","
-    # Construct the URL for the API request
-    url = f"https://api.spotify.com/v1/audio-features?market=US&ids={ids_string}"
+    return playlist_info
 
-    # Make the GET request to Spotify API
-    result = get(url, headers=headers)
-    result = json.loads(result.content)["audio_features"]
-
-    # Create ID's list
-    ids_list = list(ids.keys())
-
-    # loop over amount of songs
-    for i, result_k in enumerate(result):
-        # Check if result_k is not None
-        if result_k:
-            # Use index to get the corresponding track ID
-            track_id = ids_list[i]
-            for key in features:
-                if key in result_k:
-                    audio_value = result_k[key]
-                    # Assign the value directly to the corresponding key
-                    playlist_info[track_id][key] = audio_value
 
-    return playlist_info
+def audio_features_array(ids, song_names_pop=None, headers=None, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Fetches audio features for multiple tracks into a compact track array.
+
+    Works like `multiple_audio_feat`, but every batch is converted to a float32
+    matrix as it arrives, so no dict is kept per track (see `track_records`).
+    Duplicate IDs are requested and returned once.
+
+    Parameters:
+    - ids (iterable): Spotify track IDs; generators are consumed lazily.
+    - song_names_pop (dict): Optional mapping of track IDs to their popularity
+      score and name, used to fill the "name" and "popularity" fields. It is
+      read after all batches are fetched, so it can be filled while `ids` is consumed.
+    - headers (dict): Optional headers overriding the client's authorization.
+    - max_workers (int): Maximum number of batches requested at the same time.
+
+    Returns:
+    - numpy.ndarray: Structured track array in input order (see
+      `track_records.track_dtype`). Missing features are NaN.
+    """
+    seen = set()
+    unique_ids = (id for id in ids if not (id in seen or seen.add(id)))
+    fetch_batch = partial(_audio_features_batch, headers=headers)
+    track_ids = []
+    matrices = []
+
+    for batch, result in map_batches(
+        fetch_batch, unique_ids, AUDIO_FEATURES_BATCH_SIZE, max_workers
+    ):
+        rows = {id: row for row, id in enumerate(batch)}
+        values = np.full((len(batch), len(AUDIO_FEATURES)), np.nan, dtype=np.float32)
+        for result_k in result:
+            if result_k and result_k.id in rows:
+                # None (a feature without value) converts to NaN
+                values[rows[result_k.id]] = np.array(
+                    [getattr(result_k, key) for key in AUDIO_FEATURES], dtype=np.float64
+                )
+        track_ids.extend(batch)
+        matrices.append(values)
+
+    features = np.concatenate(matrices) if matrices else None
+    if song_names_pop is None:
+        return build_tracks(track_ids, features=features)
+    return build_tracks(
+        track_ids,
+        names=[song_names_pop.get(id, (-1, ""))[1] for id in track_ids],
+        popularity=[song_names_pop.get(id, (-1, ""))[0] for id in track_ids],
+        features=features,
+    )
@@ -0,0 +1,324 @@
+"""
+Shared HTTP client for every call made to the Spotify Web API.
+
+All modules go through a single `requests.Session` so that TCP and TLS
+connections are kept alive and reused from a connection pool instead of
+being re-established for every request. The client also applies default
+timeouts and injects the authorization header, so callers only need to pass
+the endpoint path and its parameters.
+"""
+
+import threading
+import time
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import get_metrics
+from rate_limiter import RateLimiter, backoff_delay, parse_retry_after
+from response_cache import CacheMiss, ResponseCache, cache_key, resource_type
+
+# Base URLs of the Spotify Web API and of the accounts service (token endpoint)
+API_BASE_URL = "https://api.spotify.com/v1"
+TOKEN_URL = "https://accounts.spotify.com/api/token"
+
+# Number of keep-alive connections kept open per host
+DEFAULT_POOL_SIZE = 32
+# (connect timeout, read timeout) in seconds applied to every request
+DEFAULT_TIMEOUT = (3.05, 30)
+# Retries after 429, 5xx and connection errors before a response is returned as is
+DEFAULT_MAX_RETRIES = 5
+# Only these methods are retried after 5xx and connection errors
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+
+def _default_token_provider():
+    """
+    Returns the access token of the shared token manager.
+
+    Imported lazily because `init_spotify_api` itself uses this client to
+    request the token.
+    """
+    from init_spotify_api import get_token
+
+    return get_token()
+
+
+def _default_token_invalidator(token):
+    """
+    Discards a rejected token so that the next request fetches a new one.
+    """
+    from init_spotify_api import token_manager
+
+    token_manager.invalidate(token)
+
+
+class SpotifyClient:
+    """
+    Thin wrapper around a pooled `requests.Session` for the Spotify Web API.
+
+    Args:
+        pool_size (int): Maximum number of keep-alive connections per host.
+        timeout (float or tuple): Default (connect, read) timeout in seconds.
+        token_provider (callable): Returns the access token used for the
+            authorization header. Called for every authorized request.
+        token_invalidator (callable): Called with a token the API rejected
+            with 401 before the request is retried once with a fresh token.
+        api_base_url (str): Prefix for endpoint paths such as "/tracks".
+        token_url (str): URL of the accounts token endpoint.
+        rate_limiter (RateLimiter): Request budgets shared by all threads.
+            Defaults to a limiter with the default global budget.
+        max_retries (int): Retries after 429 responses (waiting for
+            Retry-After), and for idempotent requests after 5xx responses and
+            connection errors (with jittered exponential backoff).
+        cache (ResponseCache): Persistent cache for GET responses of
+            cacheable resources. None disables caching.
+        metrics (Metrics): Registry receiving the request, retry, rate
+            limit and cache metrics. Defaults to the process-wide registry.
+    """
+
+    def __init__(
+        self,
+        pool_size=DEFAULT_POOL_SIZE,
+        timeout=DEFAULT_TIMEOUT,
+        token_provider=_default_token_provider,
+        token_invalidator=_default_token_invalidator,
+        api_base_url=API_BASE_URL,
+        token_url=TOKEN_URL,
+        rate_limiter=None,
+        max_retries=DEFAULT_MAX_RETRIES,
+        cache=None,
+        metrics=None,
+    ):
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.token_provider = token_provider
+        self.token_invalidator = token_invalidator
+        self.api_base_url = api_base_url.rstrip("/")
+        self.token_url = token_url
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter()
+        self.max_retries = max_retries
+        self.cache = cache
+        self.metrics = metrics if metrics is not None else get_metrics()
+
+        # Mount one adapter for both schemes so every host shares the same pool settings
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def url_for(self, path):
+        """
+        Resolves an endpoint path ("/tracks") to a full API URL.
+
+        Full URLs (for example the `next` links of paginated responses)
+        are returned unchanged.
+        """
+        if path.startswith(("http://", "https://")):
+            return path
+        return self.api_base_url + "/" + path.lstrip("/")
+
+    def relative_path(self, url):
+        """
+        Returns the path of a URL relative to the API base URL, e.g. "/tracks".
+        """
+        path = urlsplit(url).path
+        base_path = urlsplit(self.api_base_url).path
+        if path.startswith(base_path):
+            path = path[len(base_path) :]
+        return path
+
+    def endpoint_name(self, url):
+        """
+        Returns the name of the API endpoint a URL belongs to.
+
+        The name is the first path segment after the API base URL, e.g.
+        "tracks", "audio-features" or "artists", and "token" for the token URL.
+        """
+        if url == self.token_url:
+            return "token"
+        return self.relative_path(url).strip("/").split("/")[0]
+
+    def request(self, method, path, auth=True, **kwargs):
+        """
+        Sends a request through the pooled session.
+
+        GET requests for cacheable resources are answered from the response
+        cache while their entry is fresh; successful responses are stored in
+        it. In cache-only mode, any request the cache cannot answer raises
+        `CacheMiss`.
+
+        Every attempt waits for the rate limiter first. A 429 response pauses
+        all requests for its Retry-After delay before retrying, and idempotent
+        requests are retried with jittered exponential backoff after 5xx
+        responses and connection errors. When the authorization header is
+        injected by the client and the API answers with 401, the token is
+        invalidated and the request is sent once more with a fresh token.
+
+        Args:
+            method (str): HTTP method, e.g. "GET" or "POST".
+            path (str): Endpoint path relative to the API base URL, or a full URL.
+            auth (bool): Whether to inject the authorization header.
+            **kwargs: Passed on to `requests.Session.request`.
+
+        Returns:
+            requests.Response: The response of the last attempt.
+        """
+        url = self.url_for(path)
+        method = method.upper()
+        if self.cache is None:
+            return self._send(method, url, auth, kwargs)
+
+        cache_entry = None
+        if method == "GET":
+            resource = resource_type(self.relative_path(url))
+            ttl = self.cache.ttl_for(resource)
+            if ttl:
+                key = cache_key(method, url, kwargs.get("params"))
+                body = self.cache.get(key)
+                self.metrics.record_cache(self.endpoint_name(url), body is not None)
+                if body is not None:
+                    return _cached_response(url, body)
+                cache_entry = (key, resource, ttl)
+        if self.cache.cache_only:
+            raise CacheMiss(f"{method} {url}")
+
+        response = self._send(method, url, auth, kwargs)
+        if cache_entry is not None and response.status_code == 200:
+            key, resource, ttl = cache_entry
+            self.cache.set(key, resource, response.content, ttl)
+        return response
+
+    def _send(self, method, url, auth, kwargs):
+        """
+        Sends a request over the network, applying rate limits and retries.
+        """
+        endpoint = self.endpoint_name(url)
+        headers = dict(kwargs.pop("headers", None) or {})
+        kwargs.setdefault("timeout", self.timeout)
+        # Explicit authorization headers passed by the caller take precedence
+        inject_token = auth and "Authorization" not in headers
+        retry_errors = method in IDEMPOTENT_METHODS
+        token_refreshed = False
+        attempt = 0
+
+        while True:
+            if inject_token:
+                token = self.token_provider()
+                headers["Authorization"] = "Bearer " + token
+            start = time.perf_counter()
+            self.rate_limiter.acquire(endpoint)
+            sent = time.perf_counter()
+            self.metrics.record_wait(endpoint, sent - start)
+            try:
+                response = self.session.request(method, url, headers=headers, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.metrics.record_request(endpoint, "error", time.perf_counter() - sent)
+                if not retry_errors or attempt >= self.max_retries:
+                    raise
+                self.metrics.record_retry(endpoint, "connection_error")
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                continue
+
+            status = response.status_code
+            self.metrics.record_request(
+                endpoint, status, time.perf_counter() - sent, len(response.content)
+            )
+            if status == 401 and inject_token and not token_refreshed:
+                if self.token_invalidator is None:
+                    return response
+                self.metrics.record_retry(endpoint, "unauthorized")
+                self.token_invalidator(token)
+                token_refreshed = True
+                continue
+            if attempt >= self.max_retries:
+                return response
+            if status == 429:
+                self.metrics.record_retry(endpoint, "throttled")
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.rate_limiter.pause(retry_after)
+            elif status >= 500 and retry_errors:
+                self.metrics.record_retry(endpoint, "server_error")
+                time.sleep(backoff_delay(attempt))
+            else:
+                return response
+            attempt += 1
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+def _cached_response(url, body):
+    """
+    Wraps a cached body in a `requests.Response`, so callers handle cache hits
+    and network responses the same way.
+    """
+    response = requests.Response()
+    response.status_code = 200
+    response._content = body
+    response.url = url
+    response.encoding = "utf-8"
+    response.headers["X-Cache"] = "HIT"
+    return response
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """
+    Returns the process-wide client, creating it on first use.
+
+    The default client caches responses in `response_cache.CACHE_PATH`.
+
+    Returns:
+        SpotifyClient: The shared client instance.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = SpotifyClient(cache=ResponseCache())
+    return _client
+
+
+def configure(**settings):
+    """
+    Replaces the shared client with one built from the given settings.
+
+    Accepts the keyword arguments of `SpotifyClient`, e.g.
+    `configure(pool_size=64, timeout=10)` or
+    `configure(cache=ResponseCache(cache_only=True))` for offline runs.
+
+    Returns:
+        SpotifyClient: The new shared client instance.
+    """
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = SpotifyClient(**settings)
+    return _client
+
+
+def get(url, **kwargs):
+    """
+    Sends a GET request with the shared client. Drop-in for `requests.get`.
+    """
+    return get_client().get(url, **kwargs)
+
+
+def post(url, **kwargs):
+    """
+    Sends a POST request with the shared client. Drop-in for `requests.post`.
+    """
+    return get_client().post(url, **kwargs)
@@ -0,0 +1,245 @@
+"""
+Compact in-memory representations of tracks and their audio features.
+
+A batch of tracks is one NumPy structured array with fixed-width fields: the
+22-character track ID and the UTF-8 encoded name as bytes, popularity as int16
+and the nine audio features as float32. A track then takes about 60 bytes
+plus the width of the longest name, instead of a dict with a boxed float per
+feature. Single tracks can be handled as `TrackRecord` objects, which use
+`__slots__` instead of a per-instance dict.
+
+Missing features are NaN, a missing popularity is -1 and a missing name is
+empty, matching the defaults of the feature store.
+"""
+
+import numpy as np
+
+# Audio features kept for every track
+AUDIO_FEATURES = [
+    "danceability",
+    "energy",
+    "loudness",
+    "speechiness",
+    "acousticness",
+    "instrumentalness",
+    "liveness",
+    "valence",
+    "tempo",
+]
+
+# Fields of a track, in column order
+TRACK_FIELDS = ["id", "name", "popularity", *AUDIO_FEATURES]
+
+
+def track_dtype(name_width=1):
+    """
+    Returns the structured dtype of a track batch.
+
+    Args:
+        name_width (int): Width in bytes of the UTF-8 encoded name field.
+    """
+    return np.dtype(
+        [
+            ("id", "S22"),
+            ("name", f"S{max(name_width, 1)}"),
+            ("popularity", "i2"),
+            *[(feature, "f4") for feature in AUDIO_FEATURES],
+        ]
+    )
+
+
+def empty_tracks(size, name_width=1):
+    """
+    Returns a track batch of `size` rows with every field set to its default.
+    """
+    tracks = np.zeros(size, dtype=track_dtype(name_width))
+    tracks["popularity"] = -1
+    for feature in AUDIO_FEATURES:
+        tracks[feature] = np.nan
+    return tracks
+
+
+def _encode_names(names):
+    encoded = [name.encode("utf-8") for name in names]
+    width = max((len(name) for name in encoded), default=1)
+    return np.array(encoded, dtype=f"S{max(width, 1)}")
+
+
+def build_tracks(ids, names=None, popularity=None, features=None):
+    """
+    Builds a track batch from parallel columns.
+
+    Args:
+        ids (sequence): Spotify track IDs.
+        names (sequence): Track names; defaults to empty names.
+        popularity (sequence): Popularity scores; defaults to -1.
+        features (array-like): Matrix of shape (len(ids), 9) with the
+            features in `AUDIO_FEATURES` order; defaults to NaN.
+
+    Returns:
+        numpy.ndarray: The structured track array.
+    """
+    encoded_names = _encode_names(names) if names is not None else None
+    width = encoded_names.dtype.itemsize if encoded_names is not None else 1
+    tracks = empty_tracks(len(ids), width)
+    tracks["id"] = ids
+    if encoded_names is not None:
+        tracks["name"] = encoded_names
+    if popularity is not None:
+        tracks["popularity"] = popularity
+    if features is not None:
+        features = np.asarray(features, dtype=np.float32).reshape(len(ids), len(AUDIO_FEATURES))
+        for column, feature in enumerate(AUDIO_FEATURES):
+            tracks[feature] = features[:, column]
+    return tracks
+
+
+def tracks_from_dicts(playlist, song_names_pop=None):
+    """
+    Converts the dict outputs of `multiple_audio_feat` and `get_playlist_tracks`
+    to a track batch.
+
+    Args:
+        playlist (dict): Mapping of track IDs to their audio features.
+        song_names_pop (dict): Mapping of track IDs to their popularity score and name.
+    """
+    song_names_pop = song_names_pop or {}
+    ids = list(playlist)
+    return build_tracks(
+        ids,
+        names=[song_names_pop.get(id, (-1, ""))[1] for id in ids],
+        popularity=[song_names_pop.get(id, (-1, ""))[0] for id in ids],
+        features=[
+            [playlist[id].get(feature, np.nan) for feature in AUDIO_FEATURES] for id in ids
+        ],
+    )
+
+
+def track_ids(tracks):
+    """
+    Returns the track IDs of a batch as a list of str.
+    """
+    return [id.decode("ascii") for id in tracks["id"].tolist()]
+
+
+def track_columns(tracks):
+    """
+    Converts a track batch to a dict of column arrays with str IDs and names.
+
+    The result can be passed to `FeatureStore.upsert` or `pandas.DataFrame`.
+    """
+    columns = {
+        "id": np.char.decode(tracks["id"], "ascii"),
+        "name": np.char.decode(tracks["name"], "utf-8"),
+        "popularity": tracks["popularity"],
+    }
+    for feature in AUDIO_FEATURES:
+        columns[feature] = tracks[feature]
+    return columns
+
+
+def tracks_to_dataframe(tracks):
+    """
+    Converts a track batch to a pandas DataFrame with the columns of `TRACK_FIELDS`.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(track_columns(tracks))
+
+
+def tracks_from_dataframe(df):
+    """
+    Converts a DataFrame with (a subset of) the columns of `TRACK_FIELDS` to a track batch.
+    """
+    return build_tracks(
+        df["id"].tolist(),
+        names=df["name"].fillna("").tolist() if "name" in df else None,
+        popularity=df["popularity"].to_numpy() if "popularity" in df else None,
+        features=np.column_stack(
+            [
+                df[feature].to_numpy(dtype=np.float32)
+                if feature in df
+                else np.full(len(df), np.nan, dtype=np.float32)
+                for feature in AUDIO_FEATURES
+            ]
+        ),
+    )
+
+
+class TrackRecord:
+    """
+    A single track with its audio features.
+
+    Args:
+        id (str): Spotify track ID.
+        name (str): Track name.
+        popularity (int): Popularity score, -1 if unknown.
+        **features: Audio features; missing features are NaN.
+    """
+
+    __slots__ = tuple(TRACK_FIELDS)
+
+    def __init__(self, id, name="", popularity=-1, **features):
+        self.id = id
+        self.name = name
+        self.popularity = popularity
+        for feature in AUDIO_FEATURES:
+            setattr(self, feature, features.get(feature, np.nan))
+
+    @classmethod
+    def from_row(cls, row):
+        """
+        Creates a record from one element of a track batch.
+        """
+        return cls(
+            row["id"].decode("ascii"),
+            row["name"].decode("utf-8"),
+            int(row["popularity"]),
+            **{feature: float(row[feature]) for feature in AUDIO_FEATURES},
+        )
+
+    @property
+    def features(self):
+        """
+        The audio features as a dict, in `AUDIO_FEATURES` order.
+        """
+        return {feature: getattr(self, feature) for feature in AUDIO_FEATURES}
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in TRACK_FIELDS}
+
+    def __eq__(self, other):
+        if not isinstance(other, TrackRecord):
+            return NotImplemented
+        # NaN features compare equal
+        return all(
+            a == b or (a != a and b != b)
+            for a, b in zip(
+                (getattr(self, field) for field in TRACK_FIELDS),
+                (getattr(other, field) for field in TRACK_FIELDS),
+            )
+        )
+
+    def __repr__(self):
+        return f"TrackRecord(id={self.id!r}, name={self.name!r}, popularity={self.popularity})"
+
+
+def iter_records(tracks):
+    """
+    Yields a `TrackRecord` for every row of a track batch.
+    """
+    for row in tracks:
+        yield TrackRecord.from_row(row)
+
+
+def tracks_from_records(records):
+    """
+    Builds a track batch from `TrackRecord` objects.
+    """
+    records = list(records)
+    return build_tracks(
+        [record.id for record in records],
+        names=[record.name for record in records],
+        popularity=[record.popularity for record in records],
+        features=[[getattr(record, feature) for feature in AUDIO_FEATURES] for record in records],
+    )